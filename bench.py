@@ -0,0 +1,117 @@
+"""对本地替身站反复跑续期流程，统计延迟分位数、CPU 与峰值内存。
+
+python bench.py --runs 10 --flows http,chrome,dom --latency-ms 40
+python bench.py --runs 5 --flows chrome --env PROXY_MODE=wire      # 对比 selenium-wire / 原生代理
+python bench.py --runs 5 --flows dom,dom-human                     # 事件驱动等待 vs 拟人固定停顿
+python bench.py --runs 5 --flows chrome --env CHROME_PROFILE_DIR=/tmp/ghp  # 首轮冷 profile，之后热 profile
+python bench.py --runs 5 --startup status,list-servers,check-proxy,renew  # 各子命令 -X importtime 导入耗时与启动延迟
+"""
+import argparse, json, os, re, subprocess, sys, tempfile, time, urllib.request
+
+from mock_greathost import serve, site_args, site_from
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FLOWS = {
+    "http": ("greathost.py", {"ENGINE": "http"}),
+    "chrome": ("greathost.py", {"ENGINE": "chrome"}),
+    "dom": ("greathost备份.py", {"START_JITTER_S": "0", "EXEC_PROFILE": "fast"}),
+    "dom-human": ("greathost备份.py", {"START_JITTER_S": "0", "EXEC_PROFILE": "human"}),
+}
+
+def pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, max(0, int(round(p / 100 * len(xs) + 0.5)) - 1))] if xs else 0
+
+def run_once(script, env):
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.join(HERE, script)], env=env, cwd=HERE,
+                            stdout=subprocess.DEVNULL if not os.getenv("BENCH_VERBOSE") else None, stderr=subprocess.STDOUT)
+    _, status, ru = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return {"wall_s": time.perf_counter() - t0, "cpu_s": ru.ru_utime + ru.ru_stime, "rss_mb": ru.ru_maxrss // 1024, "exit": proc.returncode}
+
+def bench(flows, runs, base_url, extra_env, warm):
+    tmp = tempfile.mkdtemp(prefix="ghbench-")
+    out = {}
+    for name in flows:
+        script, flow_env = FLOWS[name]
+        rows = []
+        for i in range(runs):
+            urllib.request.urlopen(urllib.request.Request(f"{base_url}/__reset", method="POST")).read()
+            report = os.path.join(tmp, f"{name}-{i}.json")
+            env = {**os.environ, "GREATHOST_BASE_URL": base_url, "IP_CHECK_URL": f"{base_url}/ip",
+                   "GREATHOST_EMAIL": "bench@example.com", "GREATHOST_PASSWORD": "bench", "TARGET_NAME": "loveMC",
+                   "TELEGRAM_BOT_TOKEN": "", "PROXY_URL": "", "RUN_REPORT": report, "HISTORY_DB": "",
+                   "SESSION_CACHE": os.path.join(tmp, f"{name}.session") if warm else "",
+                   # 本地替身站的毫秒级延迟不能写进仓库里真正的缓存(CI 会还原它们并据此挑路径)
+                   "STRATEGY_CACHE": os.path.join(tmp, f"{name}.strategy.json") if warm else "",
+                   "INVENTORY_CACHE": os.path.join(tmp, f"{name}.inventory.json") if warm else "", **flow_env, **extra_env}
+            row = run_once(script, env)
+            try:
+                with open(report, encoding="utf-8") as f: rep = json.load(f)
+                row["outcome"] = (rep.get("results") or [{}])[0].get("kind")
+                row["phases"] = {k: v["total_ms"] for k, v in rep.get("phases", {}).items()}
+                row["sleep_s"] = rep.get("counters", {}).get("sleep_s", 0)
+                row["page_loads"] = {sp["page"]: sp["nav_ms"] for sp in rep.get("spans", []) if sp["name"] == "page_load"}
+            except (OSError, ValueError):
+                row["outcome"] = "no-report"
+            rows.append(row)
+            print(f"  {name} #{i + 1}: {row['wall_s']:.2f}s | CPU {row['cpu_s']:.2f}s | RSS {row['rss_mb']}MB | {row['outcome']}")
+        walls = [r["wall_s"] for r in rows]
+        out[name] = {
+            "runs": rows, "p50_s": pct(walls, 50), "p90_s": pct(walls, 90), "p99_s": pct(walls, 99), "max_s": max(walls),
+            "cpu_mean_s": sum(r["cpu_s"] for r in rows) / len(rows), "rss_peak_mb": max(r["rss_mb"] for r in rows),
+            "sleep_mean_s": sum(r.get("sleep_s", 0) for r in rows) / len(rows),
+        }
+    return out
+
+def importtime(stderr):
+    """解析 -X importtime：顶层模块累计耗时之和 + 最重的几个包"""
+    rows = [(int(cum), name, not pad) for cum, pad, name in re.findall(r"import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)", stderr)]
+    top = sorted((r for r in rows if r[2]), reverse=True)
+    return {"import_ms": round(sum(r[0] for r in top) / 1000, 1), "top": [f"{n} {c / 1000:.1f}ms" for c, n, _ in top[:6]],
+            "heavy": sorted({n.split(".")[0] for _, n, _ in rows} & {"selenium", "seleniumwire", "requests", "urllib3", "cryptography", "asyncio"})}
+
+def startup(cmds, runs, base_url, extra_env):
+    """每个子命令跑 runs 次，记录导入耗时、总启动延迟与实际加载了哪些重依赖"""
+    out = {}
+    for cmd in cmds:
+        rows = []
+        for i in range(runs):
+            env = {**os.environ, "GREATHOST_BASE_URL": base_url, "IP_CHECK_URL": f"{base_url}/ip", "TARGET_NAME": "loveMC",
+                   "GREATHOST_EMAIL": "bench@example.com", "GREATHOST_PASSWORD": "bench", "TELEGRAM_BOT_TOKEN": "",
+                   "PROXY_URL": "", "RUN_REPORT": "", "HISTORY_DB": "", "SESSION_CACHE": "",
+                   "STRATEGY_CACHE": "", "INVENTORY_CACHE": "", **extra_env}
+            t0 = time.perf_counter()
+            p = subprocess.run([sys.executable, "-X", "importtime", os.path.join(HERE, "greathost.py"), cmd], env=env, cwd=HERE,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+            row = {"wall_s": round(time.perf_counter() - t0, 3), "exit": p.returncode, **importtime(p.stderr)}
+            rows.append(row)
+            print(f"  {cmd} #{i + 1}: {row['wall_s']:.2f}s | import {row['import_ms']}ms | {','.join(row['heavy']) or '-'}")
+        out[cmd] = {"runs": rows, "wall_p50_s": pct([r["wall_s"] for r in rows], 50),
+                    "import_p50_ms": pct([r["import_ms"] for r in rows], 50), "heavy": rows[-1]["heavy"], "top": rows[-1]["top"]}
+    return out
+
+if __name__ == "__main__":
+    p = site_args(argparse.ArgumentParser(description="GreatHost 续期流程基准测试"))
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--flows", default="http,chrome,dom")
+    p.add_argument("--env", action="append", default=[], help="附加环境变量 KEY=VALUE，可重复")
+    p.add_argument("--warm", action="store_true", help="保留会话缓存，测热启动")
+    p.add_argument("--startup", default="", help="逗号分隔的 greathost.py 子命令，只测启动/导入耗时")
+    p.add_argument("--out", default="bench_output.json")
+    a = p.parse_args()
+    srv, url = serve(site_from(a))
+    print(f"🧪 替身站: {url}")
+    if a.startup:
+        res = startup(a.startup.split(","), a.runs, url, dict(kv.split("=", 1) for kv in a.env))
+        print(f"\n{'command':14} {'wall':>7} {'import':>9}  heavy")
+        for cmd, r in res.items(): print(f"{cmd:14} {r['wall_p50_s']:6.2f}s {r['import_p50_ms']:7.1f}ms  {','.join(r['heavy']) or '-'}")
+        with open(a.out, "w", encoding="utf-8") as f: json.dump({"args": vars(a), "startup": res}, f, ensure_ascii=False, indent=2)
+        srv.shutdown(); sys.exit()
+    res = bench(a.flows.split(","), a.runs, url, dict(kv.split("=", 1) for kv in a.env), a.warm)
+    print(f"\n{'flow':8} {'p50':>7} {'p90':>7} {'p99':>7} {'CPU':>7} {'RSS':>7} {'sleep':>7}")
+    for name, r in res.items():
+        print(f"{name:8} {r['p50_s']:6.2f}s {r['p90_s']:6.2f}s {r['p99_s']:6.2f}s {r['cpu_mean_s']:6.2f}s {r['rss_peak_mb']:5}MB {r['sleep_mean_s']:6.2f}s")
+    with open(a.out, "w", encoding="utf-8") as f: json.dump({"args": vars(a), "results": res}, f, ensure_ascii=False, indent=2)
+    srv.shutdown()
@@ -1,11 +1,35 @@
-import os, re, time, json, requests
+import os, sys, re, time, json, random, sqlite3, heapq, itertools, base64, hashlib, socket, struct, threading, resource, importlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from datetime import datetime, timezone
-from zoneinfo import ZoneInfo
-from seleniumwire import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from urllib.parse import unquote, urlparse
+
+class Lazy:
+    """首次用到才 import：status/check-proxy 这类子命令不加载 selenium，也不为没用到的模块付启动时间"""
+    def __init__(self, module, attr=None):
+        self._spec, self._obj = (module, attr), None
+
+    def _load(self):
+        if self._obj is None:
+            mod = importlib.import_module(self._spec[0])
+            self._obj = getattr(mod, self._spec[1]) if self._spec[1] else mod
+        return self._obj
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __call__(self, *a, **kw):
+        return self._load()(*a, **kw)
+
+requests = Lazy("requests")
+HTTPAdapter = Lazy("requests.adapters", "HTTPAdapter")
+ZoneInfo = Lazy("zoneinfo", "ZoneInfo")
+webdriver = Lazy("selenium.webdriver")
+Options = Lazy("selenium.webdriver.chrome.options", "Options")
+By = Lazy("selenium.webdriver.common.by", "By")
+WebDriverWait = Lazy("selenium.webdriver.support.ui", "WebDriverWait")
+EC = Lazy("selenium.webdriver.support.expected_conditions")
+asyncio = Lazy("asyncio")  # 只有舰队/常驻模式用得到
 
 EMAIL = os.getenv("GREATHOST_EMAIL", "")
 PASSWORD = os.getenv("GREATHOST_PASSWORD", "")
@@ -13,6 +37,62 @@ TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "")
 PROXY_URL = os.getenv("PROXY_URL", "") #=====sock5代理可留空=====
 TARGET_NAME = os.getenv("TARGET_NAME", "loveMC") #=====目标服务器名=====
+PROXY_URLS = os.getenv("PROXY_URLS", "") #=====多个代理(逗号/换行分隔)，并发探测选最快的健康代理=====
+PROXY_CACHE = os.getenv("PROXY_CACHE", ".gh_proxies.json") #=====代理探测结果缓存=====
+PROXY_TTL_S = int(os.getenv("PROXY_TTL_S", "600"))
+PROXY_PROBE_TIMEOUT = float(os.getenv("PROXY_PROBE_TIMEOUT", "8"))
+PROXY_EXIT_CHECK = os.getenv("PROXY_EXIT_CHECK", "1") != "0" #=====校验出口 IP 与代理地址一致=====
+IP_PROBE_URL = os.getenv("IP_PROBE_URL", "https://api64.ipify.org?format=json")
+PROXY_MODE = os.getenv("PROXY_MODE", "native").lower() #=====native 代理直接交给 Chrome / wire 走 selenium-wire 解密拦截=====
+ENGINE = os.getenv("ENGINE", "http").lower() #=====http 纯协议(失败自动回退) / chrome 浏览器=====
+BASE_URL = os.getenv("GREATHOST_BASE_URL", "https://greathost.es").rstrip("/") #=====可指向本地替身站=====
+IP_CHECK_URL = os.getenv("IP_CHECK_URL", "https://api.ipify.org?format=json")
+ACCOUNTS = os.getenv("ACCOUNTS", "") #=====多账号舰队模式 JSON: [{"email","password","targets":[...]}]=====
+ACCOUNTS_FILE = os.getenv("ACCOUNTS_FILE", "")
+FLEET_CONCURRENCY = int(os.getenv("FLEET_CONCURRENCY", "8")) #=====全局并发上限=====
+ACCOUNT_CONCURRENCY = int(os.getenv("ACCOUNT_CONCURRENCY", "3")) #=====单账号并发上限=====
+FLEET_RESULT = os.getenv("FLEET_RESULT", "") #=====汇总结果 JSON 输出路径=====
+MODE = os.getenv("MODE", "once").lower() #=====once 单次运行 / daemon 常驻按截止时间调度 / metrics 只读轮询导出指标=====
+MAX_HOURS = 108 #=====超过即视为接近 120h 上限=====
+DAEMON_MIN_S = int(os.getenv("DAEMON_MIN_S", "600")) #=====常驻模式两次检查最小间隔(秒)=====
+DAEMON_MAX_S = int(os.getenv("DAEMON_MAX_S", "43200")) #=====最长休眠，到点强制复查=====
+DAEMON_RETRY_S = int(os.getenv("DAEMON_RETRY_S", "1800")) #=====报错/未生效后的重试间隔=====
+BLOCK_TYPES = os.getenv("BLOCK_TYPES", "image,font,media") #=====浏览器拦截的资源类型(image/font/media/stylesheet)，留空关闭=====
+BLOCK_DOMAINS = os.getenv("BLOCK_DOMAINS", "google-analytics.com,googletagmanager.com,doubleclick.net,facebook.net,hotjar.com,clarity.ms")
+ALLOW_DOMAINS = os.getenv("ALLOW_DOMAINS", "challenges.cloudflare.com,recaptcha.net,google.com,gstatic.com") #=====永不拦截，保证登录验证能加载=====
+OUTBOX_FILE = os.getenv("OUTBOX_FILE", ".gh_outbox.json") #=====未送达通知落盘，下次运行补发=====
+NOTIFY_WINDOW_S = int(os.getenv("NOTIFY_WINDOW_S", "0")) #=====常驻模式按时间窗口合并通知，0 为每轮结束发送=====
+BROWSER_POOL = os.getenv("BROWSER_POOL", "1") != "0" #=====舰队/常驻模式复用热 Chrome=====
+POOL_SIZE = int(os.getenv("POOL_SIZE", "2")) #=====最多同时保持的 Chrome 实例数=====
+POOL_MAX_USES = int(os.getenv("POOL_MAX_USES", "20")) #=====单实例租用次数上限，到了就回收重启=====
+POOL_MAX_MB = int(os.getenv("POOL_MAX_MB", "1500")) #=====单实例(含子进程)内存上限=====
+CHROME_PROFILE_DIR = os.getenv("CHROME_PROFILE_DIR", "") #=====持久化 Chrome 用户目录(按实例分槽)，留空每次冷启动=====
+CHROME_CACHE_MB = int(os.getenv("CHROME_CACHE_MB", "64")) #=====单个 profile 的 HTTP 磁盘缓存上限=====
+CHROME_PROFILE_MB = int(os.getenv("CHROME_PROFILE_MB", "200")) #=====运行结束修剪后整个目录的体积上限(配合 CI 缓存)=====
+HISTORY_DB = os.getenv("HISTORY_DB", ".gh_history.db") #=====运行历史 SQLite，留空关闭=====
+RUN_REPORT = os.getenv("RUN_REPORT", "run_report.json") #=====每次运行的 JSON 计时报告，留空关闭=====
+PROFILE = os.getenv("PROFILE", "").lower() #=====cprofile / tracemalloc 性能剖析=====
+SESSION_CACHE = os.getenv("SESSION_CACHE", ".gh_session") #=====加密会话缓存文件，留空关闭=====
+SESSION_CACHE_KEY = os.getenv("SESSION_CACHE_KEY", "") #=====缓存密钥，留空则由账号密码派生=====
+SESSION_TTL_H = float(os.getenv("SESSION_TTL_H", "24")) #=====cookie 无过期时间时的缓存有效期(小时)=====
+API_TIMEOUT_S = float(os.getenv("API_TIMEOUT_S", "15")) #=====接口默认超时=====
+API_TIMEOUTS = {k: float(v) for k, v in (kv.split("=", 1) for kv in os.getenv("API_TIMEOUTS", "servers=10,information=8,contract=10,renew-free=30").split(",") if "=" in kv)}
+API_RETRIES = int(os.getenv("API_RETRIES", "3")) #=====GET 失败重试次数(指数退避+抖动)，POST 永不盲目重试=====
+API_BACKOFF_S = float(os.getenv("API_BACKOFF_S", "0.5"))
+API_HEDGE_MS = int(os.getenv("API_HEDGE_MS", "0")) #=====GET 超过该毫秒未返回就再发一份，取先到的，0 关闭=====
+BREAKER_FAILS = int(os.getenv("BREAKER_FAILS", "5")) #=====连续失败多少次熔断=====
+BREAKER_COOLDOWN_S = int(os.getenv("BREAKER_COOLDOWN_S", "60")) #=====熔断后多久放一个探测请求=====
+INVENTORY_CACHE = os.getenv("INVENTORY_CACHE", ".gh_inventory.json") #=====服务器名→ID 索引与元数据缓存，留空关闭=====
+INVENTORY_TTL_S = int(os.getenv("INVENTORY_TTL_S", "21600")) #=====索引有效期，过期用 ETag/If-Modified-Since 条件请求增量刷新=====
+META_TTL_S = int(os.getenv("META_TTL_S", "60")) #=====单台服务器 information 缓存有效期，0 关闭=====
+STRATEGIES = os.getenv("STRATEGIES", "api,dom") #=====可用的续期路径，按近期成功率/延迟自动挑选=====
+STRATEGY_CACHE = os.getenv("STRATEGY_CACHE", ".gh_strategy.json") #=====各路径成功率与延迟统计，跨运行保留=====
+STRATEGY_RETRY_S = int(os.getenv("STRATEGY_RETRY_S", "300")) #=====路径连续失败后多久放一次试探(半开)=====
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0")) #=====Prometheus /metrics 端口，0 关闭=====
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_FILE = os.getenv("METRICS_FILE", "") #=====node_exporter textfile 路径(*.prom)，留空关闭=====
+METRICS_POLL_S = int(os.getenv("METRICS_POLL_S", "300")) #=====MODE=metrics 后台轮询间隔，抓取只读缓存=====
+UA = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 
 STATUS_MAP = {
     "running": ["🟢", "Running"],
@@ -46,34 +126,1058 @@ def send_notice(kind, fields):
     }
     body = "\n".join([f"{e} {k}: {v}" for e, k, v in fields])
     msg = f"{titles.get(kind, '📢 通知')}\n\n{body}\n📅 时间: {now_shanghai()}"
-    
-    if TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID:
-        try:
-            requests.post(
-                f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
-                data={"chat_id": TELEGRAM_CHAT_ID, "text": msg, "parse_mode": "HTML"},
-                proxies={"http": None, "https": None}, # <-- 只需要加这一行，强制直连
-                timeout=10 # 稍微增加超时防止网络卡顿
-            )
-        except: pass
+    print(f"📨 通知入队: {titles.get(kind, '📢 通知')} | {body.replace(chr(10), ' | ')}")
+    OUTBOX.push(msg)
+
+# Outbox：通知先入队，运行结束(或按时间窗口)合并成一条摘要发送，失败落盘下次补发
+class Outbox:
+    LIMIT = 4000  # Telegram 单条上限 4096，留点余量
+    SEP = "\n\n━━━━━━━━━━\n\n"
+
+    def __init__(self, path, window_s=0):
+        self.path, self.window_s = path, window_s
+        self.q, self.lock, self.last_send, self.timer = [], threading.Lock(), 0.0, None
+
+    @property
+    def on(self):
+        return bool(TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID)
+
+    def push(self, msg):
+        if not self.on: return
+        with self.lock:
+            self.q.append(msg)
+            if self.window_s and not self.timer:
+                self.timer = threading.Timer(self.window_s, self.flush); self.timer.daemon = True; self.timer.start()
+
+    def _pending(self):
+        try:
+            with open(self.path, encoding="utf-8") as f: return json.load(f)
+        except: return []
+
+    def _persist(self, msgs):
+        if not self.path: return
+        if msgs:
+            with open(self.path, "w", encoding="utf-8") as f: json.dump(msgs, f, ensure_ascii=False)
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+
+    def digest(self, msgs):
+        """把多条通知拼成尽量少的消息，每条不超过 LIMIT"""
+        chunks, cur = [], ""
+        for m in msgs:
+            m = m[:self.LIMIT]
+            if cur and len(cur) + len(self.SEP) + len(m) > self.LIMIT:
+                chunks.append(cur); cur = m
+            else:
+                cur = f"{cur}{self.SEP}{m}" if cur else m
+        if cur: chunks.append(cur)
+        if len(msgs) > 1: chunks[0] = f"📬 <b>GreatHost 汇总</b> ({len(msgs)} 条)\n\n{chunks[0]}"[:4096]
+        return chunks
+
+    def _post(self, text):
+        for attempt in range(4):
+            gap = 1.0 - (time.time() - self.last_send)  # 同一会话每秒最多 1 条
+            if gap > 0: time.sleep(gap)
+            try:
+                r = requests.post(
+                    f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
+                    data={"chat_id": TELEGRAM_CHAT_ID, "text": text, "parse_mode": "HTML"},
+                    proxies={"http": None, "https": None}, # 强制直连
+                    timeout=10
+                )
+                self.last_send = time.time()
+                if r.status_code == 429:
+                    time.sleep(r.json().get("parameters", {}).get("retry_after", 2 ** attempt)); continue
+                if r.ok: return True
+                print(f"⚠️ TG 发送失败: {r.status_code} {r.text[:100]}")
+                if r.status_code < 500: return True  # 4xx 重发也没用，丢弃避免死循环
+            except Exception as e:
+                print(f"⚠️ TG 发送异常: {e}")
+            time.sleep(2 ** attempt)
+        return False
+
+    def flush(self):
+        if not self.on: return
+        with self.lock:
+            msgs, self.q, self.timer = self._pending() + self.q, [], None
+        if not msgs: return
+        with TRACE.span("notify", messages=len(msgs)):
+            left = self.digest(msgs)
+            while left and self._post(left[0]): left.pop(0)
+        self._persist(left)
+        if left: print(f"📮 {len(left)} 条通知未送达，已落盘待下次补发")
+
+# Tracing：分阶段计时 + 运行结束写 JSON 报告
+class Tracer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.t0, self.spans, self.counters, self.samples, self.prof = time.time(), [], {}, {}, None
+
+    @contextmanager
+    def span(self, name, **attrs):
+        start = time.perf_counter(); err = None
+        try:
+            yield
+        except Exception as e:
+            err = str(e)[:100]; raise
+        finally:
+            rec = {"name": name, "at": round(time.time() - self.t0, 3), "ms": round((time.perf_counter() - start) * 1000, 1), **attrs}
+            if err: rec["error"] = err
+            with self.lock: self.spans.append(rec)
+
+    def add(self, key, n=1):
+        with self.lock: self.counters[key] = self.counters.get(key, 0) + n
+
+    def sample(self, key, ms):
+        with self.lock: self.samples.setdefault(key, []).append(round(ms, 1))
+
+    def latency(self):
+        pick = lambda xs, p: xs[min(len(xs) - 1, int(p / 100 * len(xs)))]
+        return {k: {"count": len(xs), "p50_ms": pick(sorted(xs), 50), "p95_ms": pick(sorted(xs), 95), "max_ms": max(xs)}
+                for k, xs in self.samples.items()}
+
+    def mark(self, name, **attrs):
+        """记录一个外部测得的事件(如浏览器里的 Navigation Timing)，耗时取 attrs 里的 nav_ms"""
+        rec = {"name": name, "at": round(time.time() - self.t0, 3), "ms": float(attrs.get("nav_ms", 0)), **attrs}
+        with self.lock: self.spans.append(rec)
+
+    def start_profile(self):
+        if PROFILE == "cprofile":
+            import cProfile
+            self.prof = cProfile.Profile(); self.prof.enable()
+        elif PROFILE == "tracemalloc":
+            import tracemalloc
+            tracemalloc.start(); self.prof = tracemalloc
+
+    def _profile_result(self):
+        if PROFILE == "cprofile" and self.prof:
+            import pstats, io
+            self.prof.disable(); self.prof.dump_stats("run_profile.prof")
+            out = io.StringIO(); pstats.Stats(self.prof, stream=out).sort_stats("cumulative").print_stats(20)
+            return {"cprofile": "run_profile.prof", "top": out.getvalue().splitlines()[:40]}
+        if PROFILE == "tracemalloc" and self.prof:
+            snap = self.prof.take_snapshot(); cur, peak = self.prof.get_traced_memory(); self.prof.stop()
+            return {"tracemalloc_peak_kb": peak // 1024, "top": [str(x) for x in snap.statistics("lineno")[:15]]}
+        return None
+
+    def summary(self):
+        out = {}
+        for sp in self.spans:
+            agg = out.setdefault(sp["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "errors": 0})
+            agg["count"] += 1; agg["total_ms"] = round(agg["total_ms"] + sp["ms"], 1)
+            agg["max_ms"] = max(agg["max_ms"], sp["ms"]); agg["errors"] += "error" in sp
+        return out
+
+    def write(self, path=RUN_REPORT, **extra):
+        me, kids = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+        report = {
+            "started": datetime.fromtimestamp(self.t0, timezone.utc).isoformat(), "duration_s": round(time.time() - self.t0, 3),
+            "cpu_s": round(me.ru_utime + me.ru_stime + kids.ru_utime + kids.ru_stime, 3),
+            "peak_rss_mb": {"self": me.ru_maxrss // 1024, "children": kids.ru_maxrss // 1024},
+            "counters": self.counters, "phases": self.summary(), "latency": self.latency(), "spans": self.spans, **extra
+        }
+        prof = self._profile_result()
+        if prof: report["profile"] = prof
+        if path:
+            with open(path, "w", encoding="utf-8") as f: json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+            print(f"🧾 运行报告已写入 {path}")
+        return report
+
+TRACE = Tracer()
+OUTBOX = Outbox(OUTBOX_FILE, NOTIFY_WINDOW_S if MODE == "daemon" else 0)
+
+# Metrics：Prometheus 文本格式导出，抓取只读内存里的缓存值，不触发浏览器/登录
+class Metrics:
+    BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+    HELP = {
+        "greathost_remaining_hours": ("gauge", "Remaining contract hours (calculate_hours)"),
+        "greathost_server_status": ("gauge", "1 for the current server status"),
+        "greathost_cooldown_seconds": ("gauge", "Seconds until the free renewal is available again"),
+        "greathost_last_update_timestamp_seconds": ("gauge", "Unix time the server values were last refreshed"),
+        "greathost_renewals_total": ("counter", "Renewal attempts by outcome"),
+        "greathost_poll_errors_total": ("counter", "Failed background polls"),
+        "greathost_login_seconds": ("histogram", "Login latency (cached session restore or full login)"),
+        "greathost_api_seconds": ("histogram", "API call latency per attempt"),
+        "greathost_run_seconds": ("histogram", "Total latency of one renewal run/round"),
+    }
 
-class GH:
     def __init__(self):
+        self.lock, self.values, self.hists, self.srv = threading.Lock(), {}, {}, None
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def set(self, name, value, **labels):
+        """value 可以是函数，抓取时再求值(冷却倒计时这类随时间变化的量)"""
+        with self.lock: self.values[self._key(name, labels)] = value
+
+    def drop(self, name, **labels):
+        with self.lock:
+            for k in [k for k in self.values if k[0] == name and all(dict(k[1]).get(a) == b for a, b in labels.items())]: del self.values[k]
+
+    def inc(self, name, n=1, **labels):
+        with self.lock:
+            k = self._key(name, labels); self.values[k] = self.values.get(k, 0) + n
+
+    def observe(self, name, secs, **labels):
+        with self.lock:
+            h = self.hists.setdefault(self._key(name, labels), [[0] * len(self.BUCKETS), 0.0, 0])
+            for i, b in enumerate(self.BUCKETS):
+                if secs <= b: h[0][i] += 1
+            h[1] += secs; h[2] += 1
+
+    @staticmethod
+    def account(email):
+        """指标里不放明文邮箱：前三位打码 + 短哈希(前缀相同的账号也不会串)"""
+        return f"{(email or '')[:3]}***{hashlib.sha256((email or '').lower().encode()).hexdigest()[:6]}"
+
+    def server(self, res):
+        """一台服务器的续期/轮询结果写进 gauge"""
+        who = {"account": self.account(res.get("account") or EMAIL), "server": res["name"]}
+        if res.get("sid") is None: return
+        self.set("greathost_remaining_hours", res["after"] or res["before"], **who)
+        if res.get("status"):
+            self.drop("greathost_server_status", **who)
+            self.set("greathost_server_status", 1, **who, status=res["status"])
+        until = time.time() + (res.get("cooldown_s") or 0)
+        self.set("greathost_cooldown_seconds", lambda: max(0, round(until - time.time())), **who)
+        self.set("greathost_last_update_timestamp_seconds", round(time.time()), **who)
+
+    def render(self):
+        esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        fmt = lambda labels: "{" + ",".join(f'{k}="{esc(v)}"' for k, v in labels) + "}" if labels else ""
+        with self.lock: values, hists = dict(self.values), {k: (list(v[0]), v[1], v[2]) for k, v in self.hists.items()}
+        out = []
+        for name, (kind, doc) in self.HELP.items():
+            out += [f"# HELP {name} {doc}", f"# TYPE {name} {kind}"]
+            for (n, labels), v in sorted(values.items(), key=lambda kv: kv[0]):
+                if n == name: out.append(f"{name}{fmt(labels)} {v() if callable(v) else v}")
+            for (n, labels), (buckets, total, count) in sorted(hists.items()):
+                if n != name: continue
+                for b, c in zip(self.BUCKETS, buckets): out.append(f"{name}_bucket{fmt(labels + (('le', b),))} {c}")
+                out += [f"{name}_bucket{fmt(labels + (('le', '+Inf'),))} {count}", f"{name}_sum{fmt(labels)} {round(total, 3)}", f"{name}_count{fmt(labels)} {count}"]
+        return "\n".join(out) + "\n"
+
+    def write_textfile(self, path=METRICS_FILE):
+        if not path: return
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f: f.write(self.render())
+        os.replace(tmp, path)  # node_exporter 不会读到写了一半的文件
+
+    def serve(self, port=METRICS_PORT, host=METRICS_HOST):
+        if not port or self.srv: return
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *a): pass
+            def do_GET(self):
+                body = metrics.render().encode() if self.path.split("?")[0] == "/metrics" else b"see /metrics\n"
+                self.send_response(200 if body[:1] == b"#" else 404)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body))); self.end_headers(); self.wfile.write(body)
+        self.srv = ThreadingHTTPServer((host, port), Handler)
+        self.srv.daemon_threads = True
+        threading.Thread(target=self.srv.serve_forever, daemon=True).start()
+        print(f"📈 指标已导出: http://{host}:{port}/metrics")
+
+METRICS = Metrics()
+
+def nap(secs):
+    """带统计的 sleep，报告里能看出固定等待吃掉了多少时间"""
+    TRACE.add("sleeps"); TRACE.add("sleep_s", round(secs, 3))
+    time.sleep(secs)
+
+# Session cache：cookie 加密落盘，下次运行先用一次 API 校验，失效才完整登录
+class SessionCache:
+    def __init__(self, path):
+        self.path, self.lock, self._fernet = path, threading.Lock(), None
+
+    @property
+    def fernet(self):
+        """cryptography 第一次读写缓存时才加载"""
+        if self._fernet is None:
+            try:
+                from cryptography.fernet import Fernet
+                self._fernet = Fernet
+            except ImportError:
+                self._fernet = False
+                if self.path: print("⚠️ 未安装 cryptography，会话缓存已关闭")
+        return self._fernet
+
+    def _box(self, email, password):
+        salt = hashlib.sha256(f"greathost:{email}".encode()).digest()
+        key = hashlib.pbkdf2_hmac("sha256", (SESSION_CACHE_KEY or password).encode(), salt, 100_000)
+        return self.fernet(base64.urlsafe_b64encode(key))
+
+    def _slot(self, email):
+        return hashlib.sha256(email.lower().encode()).hexdigest()[:16]
+
+    def _read(self):
+        try:
+            with open(self.path, encoding="utf-8") as f: return json.load(f)
+        except: return {}
+
+    def load(self, email, password):
+        if not (self.path and self.fernet): return None
+        token = self._read().get(self._slot(email))
+        if not token: return None
+        try:
+            data = json.loads(self._box(email, password).decrypt(token.encode()))
+        except Exception:
+            return None
+        return data["cookies"] if data.get("exp", 0) > time.time() else None
+
+    def save(self, email, password, cookies):
+        if not (self.path and self.fernet and cookies): return
+        exps = [c["expiry"] for c in cookies if c.get("expiry")]
+        exp = min(exps) if exps else time.time() + SESSION_TTL_H * 3600
+        token = self._box(email, password).encrypt(json.dumps({"cookies": cookies, "exp": exp}).encode()).decode()
+        with self.lock:
+            data = self._read(); data[self._slot(email)] = token
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f: json.dump(data, f)
+            os.replace(tmp, self.path)
+
+    def drop(self, email):
+        if not (self.path and self.fernet): return
+        with self.lock:
+            data = self._read()
+            if data.pop(self._slot(email), None) is None: return
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f: json.dump(data, f)
+            os.replace(tmp, self.path)
+
+SESSIONS = SessionCache(SESSION_CACHE)
+
+def driver_cookies(d):
+    return [{k: c[k] for k in ("name", "value", "domain", "path", "expiry", "secure", "httpOnly") if k in c} for c in d.get_cookies()]
+
+def session_state(status, ctype=""):
+    """会话校验结果：True 有效；False 已失效(401、跳转到登录页)；None 说不准(5xx/429/403 挑战页/网络错误)，缓存留着"""
+    if status == 200: return "json" in (ctype or "")
+    if status == 401 or 300 <= status < 400 or status == 0: return False  # fetch manual 跳转的 status 为 0
+    return None
+
+def driver_restore(d, cookies):
+    """在当前域名页面注入 cookie，并用一次 API 调用校验会话"""
+    for c in cookies:
+        try: d.add_cookie(c)
+        except: pass
+    js = "return fetch('/api/servers',{redirect:'manual'}).then(r=>[r.status,r.headers.get('content-type')||'']).catch(()=>[-1,''])"
+    try: status, ctype = d.execute_script(js)
+    except Exception: return None
+    return session_state(status, ctype)
+
+# Event-driven waits：用 MutationObserver / 网络空闲代替固定 sleep
+WAIT_MUTATION_JS = """
+const [sel, text, timeout, done] = arguments;
+const el = () => sel && document.querySelector(sel);
+const init = el() ? el().textContent : null;
+const hit = () => (text && document.body.innerText.includes(text)) || (sel && el() && el().textContent !== init);
+if (hit()) return done(true);
+const obs = new MutationObserver(() => { if (hit()) { obs.disconnect(); done(true); } });
+obs.observe(document.documentElement, {subtree: true, childList: true, characterData: true, attributes: true});
+setTimeout(() => { obs.disconnect(); done(false); }, timeout);
+"""
+
+WAIT_SETTLED_JS = """
+const [quiet, timeout, done] = arguments;
+const t0 = Date.now(); let last = t0, n = performance.getEntriesByType('resource').length;
+const obs = new MutationObserver(() => { last = Date.now(); });
+obs.observe(document.documentElement, {subtree: true, childList: true, characterData: true, attributes: true});
+(function tick() {
+  const m = performance.getEntriesByType('resource').length;
+  if (m !== n) { n = m; last = Date.now(); }
+  if ((document.readyState === 'complete' && Date.now() - last >= quiet) || Date.now() - t0 >= timeout) { obs.disconnect(); return done(true); }
+  setTimeout(tick, 50);
+})();
+"""
+
+def wait_mutation(d, selector=None, text=None, timeout_s=5):
+    """等到页面出现 text，或 selector 的文本发生变化；超时返回 False"""
+    with TRACE.span("wait_mutation"):
+        try: return bool(d.execute_async_script(WAIT_MUTATION_JS, selector, text, int(timeout_s * 1000)))
+        except Exception: return False
+
+def wait_settled(d, quiet_ms=250, timeout_s=5):
+    """等 DOM 不再变化且没有新资源请求；点击触发了跳转时退化为等 readyState"""
+    with TRACE.span("wait_settled"):
+        try:
+            d.execute_async_script(WAIT_SETTLED_JS, quiet_ms, int(timeout_s * 1000))
+        except Exception:
+            try: WebDriverWait(d, timeout_s, poll_frequency=0.1).until(lambda x: x.execute_script("return document.readyState") == "complete")
+            except Exception: pass
+
+# Resource blocking：丢掉自动化用不到的图片/字体/统计脚本
+class ResourceBlocker:
+    EXT = {"image": ("png", "jpg", "jpeg", "gif", "webp", "svg", "ico", "avif"), "font": ("woff", "woff2", "ttf", "otf", "eot"),
+           "media": ("mp4", "webm", "mp3", "ogg", "wav"), "stylesheet": ("css",)}
+    EST = {"image": 40_000, "font": 60_000, "media": 500_000, "stylesheet": 30_000, "domain": 50_000} # 单个请求估算字节
+
+    def __init__(self, types=BLOCK_TYPES, domains=BLOCK_DOMAINS, allow=ALLOW_DOMAINS):
+        split = lambda v: [x.strip().lower() for x in v.split(",") if x.strip()]
+        self.types, self.domains, self.allow = [t for t in split(types) if t in self.EXT], split(domains), split(allow)
+        self.blocked, self.bytes_in = {}, 0
+
+    @property
+    def on(self):
+        return bool(self.types or self.domains)
+
+    def _match(self, host, doms):
+        return any(host == d or host.endswith("." + d) for d in doms)
+
+    def classify(self, url):
+        host = (urlparse(url).hostname or "").lower()
+        if self._match(host, self.allow): return None
+        if self._match(host, self.domains): return "domain"
+        ext = urlparse(url).path.rsplit(".", 1)[-1].lower()
+        return next((t for t in self.types if ext in self.EXT[t]), None)
+
+    def prepare(self, opts):
+        # CDP 模式靠 performance 日志统计被拦截的请求
+        if self.on: opts.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        return opts
+
+    def attach(self, d):
+        if not self.on: return
+        if hasattr(d, "request_interceptor"):
+            def intercept(req):
+                kind = self.classify(req.url)
+                if kind:
+                    self.blocked[kind] = self.blocked.get(kind, 0) + 1
+                    req.abort()
+            d.request_interceptor = intercept
+        else:
+            # setBlockedURLs 只认 URL 通配，表达不了"白名单除外"：有 ALLOW_DOMAINS 时按类型拦截只限站点自己的域名，
+            # 覆盖白名单主机的拦截域名也不下发，保证验证码等资源照常加载(selenium-wire 模式逐个 classify，不受此限)
+            site = (urlparse(BASE_URL).hostname or "").lower()
+            hosts = [""] if not self.allow else [] if self._match(site, self.allow) else [site, "*." + site]
+            doms = [dom for dom in self.domains if not any(self._match(a, [dom]) for a in self.allow)]
+            urls = ([f"*.{e}" if not h else f"*://{h}/*.{e}" for h in hosts for t in self.types for e in self.EXT[t]]
+                    + [f"*://*{dom}/*" for dom in doms])
+            if not urls: return
+            d.execute_cdp_cmd("Network.enable", {})
+            d.execute_cdp_cmd("Network.setBlockedURLs", {"urls": urls})
+
+    def collect(self, d):
+        """读取并清空 CDP performance 日志，累计被拦截数与实际传输字节"""
+        if not self.on or hasattr(d, "request_interceptor"): return
+        try: logs = d.get_log("performance")
+        except Exception: return
+        urls = {}
+        for e in logs:
+            m = json.loads(e["message"])["message"]; p = m.get("params", {})
+            if m["method"] == "Network.requestWillBeSent": urls[p["requestId"]] = p["request"]["url"]
+            elif m["method"] == "Network.loadingFinished": self.bytes_in += int(p.get("encodedDataLength", 0))
+            elif m["method"] == "Network.loadingFailed" and p.get("blockedReason"):
+                kind = self.classify(urls.get(p["requestId"], "")) or "domain"
+                self.blocked[kind] = self.blocked.get(kind, 0) + 1
+
+    def report(self, d):
+        if not self.on: return
+        self.collect(d)
+        saved = sum(self.EST[k] * n for k, n in self.blocked.items())
+        TRACE.add("blocked_requests", sum(self.blocked.values())); TRACE.add("blocked_bytes_est", saved); TRACE.add("page_bytes", self.bytes_in)
+        detail = ", ".join(f"{k} {n}" for k, n in self.blocked.items()) or "无"
+        moved = f" | 实际传输 {self.bytes_in // 1024}KB" if self.bytes_in else ""
+        print(f"🧱 资源拦截: {sum(self.blocked.values())} 个请求 ({detail}) | 估算节省 {saved // 1024}KB{moved}")
+
+# Proxy pool：并发探测、出口 IP 校验、按延迟择优、运行中失效自动切换
+def mask_host(h):
+    if not h: return "Unknown"
+    if ":" in h:
+        p = h.split(':')
+        return f"{p[0]}:{p[1]}:****:{p[-1]}" if len(p) > 3 else f"{h[:9]}****"
+    parts = h.split('.')
+    if len(parts) == 4: return f"{parts[0]}.{parts[1]}.***.{parts[3]}"
+    if len(parts) >= 3: return f"{parts[0]}.****.{parts[-1]}"
+    return f"{h[:4]}****"
+
+def proxy_host(url):
+    raw = (url or "").strip()
+    if not raw: return None
+    try:
+        host = urlparse(raw if "://" in raw else f"http://{raw}").hostname
+        return host.lower().replace("[","").replace("]","") if host else None
+    except:
+        return None
+
+def exit_ip_ok(url, ip):
+    expected = proxy_host(url)
+    if not expected: return True
+    match_full = (expected in ip) or (ip in url.lower())
+    ipv6_match = (":" in ip and ":" in expected and ip.split(':')[:4] == expected.split(':')[:4])
+    return match_full or ipv6_match
+
+class ProxyPool:
+    def __init__(self, urls, cache_path=PROXY_CACHE, ttl=PROXY_TTL_S):
+        self.urls = [u.strip() for u in re.split(r"[,\n]", urls) if u.strip() and u.strip().lower() != "none"]
+        self.cache_path, self.ttl, self.lock = cache_path, ttl, threading.Lock()
+        self.health, self.cur, self.cur_ts, self.last_err = self._load(), None, 0.0, ""
+
+    def _key(self, url):
+        return hashlib.sha256(url.encode()).hexdigest()[:16]  # 缓存里不落明文账号密码
+
+    def _load(self):
+        try:
+            with open(self.cache_path, encoding="utf-8") as f: return json.load(f)
+        except: return {}
+
+    def _save(self):
+        if not self.cache_path: return
+        with open(self.cache_path, "w", encoding="utf-8") as f: json.dump(self.health, f)
+
+    def probe(self, url):
+        t0 = time.time(); rec = {"ok": False, "ts": t0}
+        try:
+            r = requests.get(IP_PROBE_URL, proxies={"http": url, "https": url}, timeout=PROXY_PROBE_TIMEOUT)
+            ip = r.json().get("ip", "").lower()
+            rec.update(ip=mask_host(ip), latency=round(time.time() - t0, 3))
+            if PROXY_EXIT_CHECK and not exit_ip_ok(url, ip):
+                rec["error"] = f"BLOCK_ERR|{mask_host(proxy_host(url))}|{mask_host(ip)}"
+            else:
+                rec["ok"] = True
+        except Exception as e:
+            rec["error"] = str(e)[:100]
+        return rec
+
+    def refresh(self, force=False):
+        """TTL 内复用缓存结果，过期的代理并发探测"""
+        stale = [u for u in self.urls if force or time.time() - self.health.get(self._key(u), {}).get("ts", 0) > self.ttl]
+        if stale:
+            with TRACE.span("proxy_probe", count=len(stale)), ThreadPoolExecutor(len(stale)) as ex:
+                for u, rec in zip(stale, ex.map(self.probe, stale)):
+                    self.health[self._key(u)] = rec
+                    print(f"🧭 代理 {mask_host(proxy_host(u))}: {'✅ ' + str(rec.get('latency')) + 's' if rec['ok'] else '❌ ' + rec.get('error', '')}")
+            self._save()
+
+    def ranked(self):
+        alive = [u for u in self.urls if self.health.get(self._key(u), {}).get("ok")]
+        return sorted(alive, key=lambda u: self.health[self._key(u)].get("latency", 99))
+
+    def current(self):
+        """当前使用的代理；未配置代理返回空串，全部不可用则抛异常"""
+        if not self.urls: return ""
+        with self.lock:
+            # 常驻模式下 TTL 到期重新探测择优，失效过的代理恢复后也能重新选上
+            if self.cur is None or time.time() - self.cur_ts > self.ttl:
+                self.refresh()
+                self.cur, self.cur_ts = next(iter(self.ranked()), None), time.time()
+                if self.cur: self.last_err = ""
+                if self.cur is None:
+                    errs = [self.last_err] + [self.health.get(self._key(u), {}).get("error", "") for u in self.urls]
+                    errs = [e for e in errs if e]
+                    raise Exception(next((e for e in errs if e.startswith("BLOCK_ERR")), f"无可用代理: {errs[:1]}"))
+            return self.cur
+
+    def failover(self, url, err=""):
+        """先复测代理：确实不通才标记失效并切到下一个健康代理；复测正常或没有可切换的返回 None"""
+        rec = self.probe(url)
+        with self.lock:
+            self.health[self._key(url)] = rec
+            if rec["ok"]:
+                self._save()
+                print(f"🧭 代理 {mask_host(proxy_host(url))} 复测正常，错误与代理无关: {str(err)[:60]}")
+                return None
+            self._save(); self.last_err = str(err)[:100]
+            nxt = next(iter(self.ranked()), None)
+            if self.cur == url: self.cur, self.cur_ts = nxt, time.time()
+            TRACE.add("proxy_failovers")
+            print(f"🔀 代理 {mask_host(proxy_host(url))} 失效({str(err)[:60]})，切换到 {mask_host(proxy_host(nxt)) if nxt else '无'}")
+            return self.cur if self.cur != url else None
+
+PROXIES = ProxyPool(PROXY_URLS or PROXY_URL)
+
+# Chrome 网络错误与出口校验失败的特征；密码错误、站点报错之类不应该换代理
+PROXY_ERR_MARKS = ("ERR_PROXY", "ERR_TUNNEL", "ERR_SOCKS", "ERR_CONNECTION", "ERR_TIMED_OUT", "ERR_NAME_NOT_RESOLVED", "BLOCK_ERR")
+
+def proxy_error(e):
+    if isinstance(e, (ConnectionError, socket.timeout)): return True
+    exc = getattr(sys.modules.get("requests"), "exceptions", None)  # 没加载过 requests 就不可能是它抛的
+    if exc and isinstance(e, (exc.ProxyError, exc.ConnectTimeout, exc.ConnectionError)): return True
+    return any(m in str(e) for m in PROXY_ERR_MARKS)
+
+# Native proxy：代理直接交给 Chrome，带认证的代理由本地转发器补上认证，不再经 selenium-wire 解密 TLS
+class LocalForwarder:
+    """监听 127.0.0.1 的 HTTP 代理，把 CONNECT/明文请求经上游 socks5/http/https 代理(带认证)转发出去"""
+    SCHEMES = ("http", "https", "socks5", "socks5h")
+
+    def __init__(self, upstream):
+        if upstream.scheme not in self.SCHEMES: raise ValueError(f"本地转发器不支持 {upstream.scheme} 代理: 仅 {'/'.join(self.SCHEMES)}")
+        self.up = upstream
+        self.srv = socket.create_server(("127.0.0.1", 0))
+        self.port = self.srv.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            c, _ = self.srv.accept()
+            threading.Thread(target=self._handle, args=(c,), daemon=True).start()
+
+    def _recv(self, sock, n):
+        buf = b""
+        while len(buf) < n:
+            chunk = sock.recv(n - len(buf))
+            if not chunk: raise ConnectionError("上游代理提前关闭")
+            buf += chunk
+        return buf
+
+    def _read_head(self, sock):
+        buf = b""
+        while b"\r\n\r\n" not in buf:
+            chunk = sock.recv(4096)
+            if not chunk: raise ConnectionError("连接提前关闭")
+            buf += chunk
+        return buf.split(b"\r\n\r\n", 1)
+
+    def _open(self, host, port):
+        u = self.up
+        port_up = u.port or (1080 if u.scheme.startswith("socks") else 443 if u.scheme == "https" else 80)  # 同 requests：http 代理省略端口即 80
+        up = socket.create_connection((u.hostname, port_up), timeout=20)
+        user, pw = unquote(u.username or ""), unquote(u.password or "")  # urlparse 不解码，p%40ss 要还原成 p@ss
+        if u.scheme == "https":
+            import ssl
+            up = ssl.create_default_context().wrap_socket(up, server_hostname=u.hostname)  # https 代理：CONNECT 和认证走 TLS
+        if u.scheme.startswith("socks5"):
+            user, pw = user.encode(), pw.encode()
+            up.sendall(b"\x05\x02\x00\x02")
+            if self._recv(up, 2)[1] == 2:
+                up.sendall(b"\x01" + bytes([len(user)]) + user + bytes([len(pw)]) + pw)
+                if self._recv(up, 2)[1] != 0: raise ConnectionError("socks5 认证失败")
+            up.sendall(b"\x05\x01\x00\x03" + bytes([len(host)]) + host.encode() + struct.pack(">H", port))
+            rep = self._recv(up, 4)
+            if rep[1] != 0: raise ConnectionError(f"socks5 连接失败: {rep[1]}")
+            alen = {1: 4, 4: 16}.get(rep[3]) or self._recv(up, 1)[0]
+            self._recv(up, alen + 2)
+        else:
+            cred = base64.b64encode(f"{user}:{pw}".encode()).decode()
+            auth = f"Proxy-Authorization: Basic {cred}\r\n" if user else ""
+            up.sendall(f"CONNECT {host}:{port} HTTP/1.1\r\nHost: {host}:{port}\r\n{auth}\r\n".encode())
+            head, _ = self._read_head(up)
+            if b" 200" not in head.split(b"\r\n", 1)[0]: raise ConnectionError(head.split(b"\r\n", 1)[0].decode())
+        up.settimeout(None)
+        return up
+
+    def _handle(self, c):
+        try:
+            head, rest = self._read_head(c)
+            method, target, ver = head.split(b"\r\n", 1)[0].decode().split(" ", 2)
+            if method == "CONNECT":
+                host, port = target.rsplit(":", 1)
+                up = self._open(host.strip("[]"), int(port))
+                c.sendall(b"HTTP/1.1 200 Connection Established\r\n\r\n")
+            else:
+                t = urlparse(target)
+                up = self._open(t.hostname, t.port or 80)
+                line = f"{method} {t.path or '/'}{'?' + t.query if t.query else ''} {ver}".encode()
+                up.sendall(line + b"\r\n" + head.split(b"\r\n", 1)[1] + b"\r\n\r\n")
+            if rest: up.sendall(rest)
+            threading.Thread(target=self._pipe, args=(up, c), daemon=True).start()
+            self._pipe(c, up)
+        except Exception:
+            c.close()
+
+    def _pipe(self, a, b):
+        try:
+            while True:
+                data = a.recv(65536)
+                if not data: break
+                b.sendall(data)
+        except OSError:
+            pass
+        finally:
+            for x in (a, b):
+                try: x.shutdown(socket.SHUT_RDWR)
+                except OSError: pass
+
+FORWARDERS = {}
+
+# Chrome profile：user-data-dir + 磁盘缓存跨运行保留，冷启动少下一遍静态资源
+class ProfileDirs:
+    # 只有这两类 HTTP/JS 缓存进 CI 缓存；Cookies、Local Storage、登录数据等会话状态一律不落盘带走
+    KEEP = ("DiskCache", "Code Cache")
+
+    def __init__(self, root):
+        self.root, self.used, self.lock = root, set(), threading.Lock()
+
+    def take(self):
+        """同一 user-data-dir 同时只能给一个 Chrome 用，并发实例各占一个槽位"""
+        with self.lock:
+            n = next(i for i in itertools.count() if i not in self.used); self.used.add(n)
+        path = os.path.abspath(os.path.join(self.root, f"chrome-{n}"))
+        for lock in ("SingletonLock", "SingletonSocket", "SingletonCookie"):
+            try: os.remove(os.path.join(path, lock))  # CI 还原出来的锁指向别的主机，会让 Chrome 拒绝启动
+            except OSError: pass
+        warm = os.path.isdir(os.path.join(path, "DiskCache")) and bool(os.listdir(os.path.join(path, "DiskCache")))
+        return n, path, warm
+
+    def give(self, n):
+        with self.lock: self.used.discard(n)
+
+    def prune(self, max_mb=CHROME_PROFILE_MB):
+        """除 KEEP 里的缓存目录外全部删掉(会话不进 CI 缓存)，再从最久没动的缓存文件删起，直到整体不超过 max_mb；须在 Chrome 退出后、CI 保存缓存前调用"""
+        if not self.root or not os.path.isdir(self.root): return
+        total, cache = 0, []
+        with self.lock: busy = {f"chrome-{n}" for n in self.used}
+        for slot in os.listdir(self.root):
+            base = os.path.join(self.root, slot)
+            if slot in busy: continue
+            if not os.path.isdir(base):
+                try: os.remove(base)
+                except OSError: pass
+                continue
+            for top, dirs, files in os.walk(base, topdown=True):
+                for d in [d for d in dirs if d in self.KEEP]:
+                    dirs.remove(d)
+                    for ctop, _, cfiles in os.walk(os.path.join(top, d)):
+                        for f in cfiles:
+                            fp = os.path.join(ctop, f)
+                            try: st = os.lstat(fp)
+                            except OSError: continue
+                            total += st.st_size; cache.append((st.st_mtime, st.st_size, fp))
+                for f in files:
+                    try: os.remove(os.path.join(top, f))
+                    except OSError: pass
+            for top, _, _ in os.walk(base, topdown=False):
+                if top != base and not any(k in top.split(os.sep) for k in self.KEEP):
+                    try: os.rmdir(top)  # 只删已经空了的目录
+                    except OSError: pass
+        freed = 0
+        for _, size, fp in sorted(cache):
+            if total - freed <= max_mb * 1024 * 1024: break
+            try: os.remove(fp); freed += size
+            except OSError: pass
+        print(f"🗂️ Chrome profile {(total - freed) // 1024 // 1024}MB (修剪 {freed // 1024 // 1024}MB)")
+
+PROFILES = ProfileDirs(CHROME_PROFILE_DIR)
+
+PAGE_TIMING_JS = """const n = performance.getEntriesByType('navigation')[0] || {}, r = performance.getEntriesByType('resource');
+return {nav_ms: Math.round(n.duration || 0), ttfb_ms: Math.round((n.responseStart || 0) - (n.requestStart || 0)),
+  dcl_ms: Math.round(n.domContentLoadedEventEnd || 0), resources: r.length,
+  cached: r.filter(x => x.transferSize === 0 && x.decodedBodySize > 0).length,
+  transfer_kb: Math.round(r.reduce((a, x) => a + (x.transferSize || 0), n.transferSize || 0) / 1024)};"""
+
+def page_timing(d, page):
+    """Navigation Timing 记进报告，冷/热 profile 的页面加载可以直接对比"""
+    try: t = d.execute_script(PAGE_TIMING_JS)
+    except Exception: return None
+    warm = getattr(d, "gh_warm", False)
+    TRACE.mark("page_load", page=page, warm=warm, **t)
+    print(f"📄 {page} 加载 {t['nav_ms']}ms | 资源 {t['resources']} 个(缓存 {t['cached']}) | 传输 {t['transfer_kb']}KB | {'热' if warm else '冷'} profile")
+    return t
+
+def chrome_proxy(url):
+    """把 PROXY_URL 转成 Chrome --proxy-server 参数；带账号密码时换成本地转发器地址"""
+    u = urlparse(url if "://" in url else f"http://{url}")
+    if not u.username:
+        return f"{'socks5' if u.scheme.startswith('socks5') else u.scheme}://{u.netloc}"
+    if url not in FORWARDERS: FORWARDERS[url] = LocalForwarder(u)
+    return f"http://127.0.0.1:{FORWARDERS[url].port}"
+
+def make_driver(opts, blk=None, proxy=PROXY_URL):
+    """统一的 Chrome 启动入口：默认原生代理，仅 PROXY_MODE=wire 时才加载 selenium-wire"""
+    if blk: blk.prepare(opts)
+    slot, warm = None, False
+    if PROFILES.root:
+        slot, path, warm = PROFILES.take()
+        opts.add_argument(f"--user-data-dir={path}")
+        opts.add_argument(f"--disk-cache-dir={os.path.join(path, 'DiskCache')}")
+        opts.add_argument(f"--disk-cache-size={CHROME_CACHE_MB * 1024 * 1024}")
+    try:
+        if PROXY_MODE == "wire":
+            from seleniumwire import webdriver as wire
+            sw = {'proxy': {'http': proxy, 'https': proxy, 'no_proxy': 'localhost,127.0.0.1'}} if proxy else None
+            d = wire.Chrome(options=opts, seleniumwire_options=sw)
+        else:
+            if proxy: opts.add_argument(f"--proxy-server={chrome_proxy(proxy)}")
+            d = webdriver.Chrome(options=opts)
+    except Exception:
+        if slot is not None: PROFILES.give(slot)
+        raise
+    d.gh_slot, d.gh_warm = slot, warm
+    TRACE.add("chrome_warm_starts" if warm else "chrome_cold_starts")
+    if blk: blk.attach(d)
+    return d
+
+def quit_driver(d):
+    """退出 Chrome 并归还 profile 槽位"""
+    try: d.quit()
+    finally:
+        if getattr(d, "gh_slot", None) is not None: PROFILES.give(d.gh_slot)
+
+# Browser pool：热 Chrome 复用，每个账号一个独立 browser context，按次数/内存回收
+def proc_tree_rss_mb(pid):
+    """Linux 下统计进程树(chromedriver + 所有 Chrome 子进程)的 RSS"""
+    kids = {}
+    for p in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if not p.isdigit(): continue
+        try:
+            with open(f"/proc/{p}/stat") as f: kids.setdefault(int(f.read().rsplit(")", 1)[1].split()[1]), []).append(int(p))
+        except (OSError, IndexError, ValueError): pass
+    total, todo = 0, [pid]
+    while todo:
+        p = todo.pop(); todo += kids.get(p, [])
+        try:
+            with open(f"/proc/{p}/status") as f: total += int(re.search(r"VmRSS:\s+(\d+)", f.read()).group(1))
+        except (OSError, AttributeError): pass
+    return total // 1024
+
+class Lease:
+    def __init__(self, pool, inst, ctx, tab):
+        self.pool, self.inst, self.ctx, self.tab = pool, inst, ctx, tab
+        self.d, self.blk, self.done = inst["d"], inst["blk"], False
+
+    def release(self):
+        if self.done: return  # 出错路径上可能被 gh.close 和调用方各归还一次
+        self.done = True
+        self.pool.release(self)
+
+class BrowserPool:
+    def __init__(self, size=POOL_SIZE, max_uses=POOL_MAX_USES, max_mb=POOL_MAX_MB):
+        self.size, self.max_uses, self.max_mb = max(1, size), max_uses, max_mb
+        self.items, self.cv = [], threading.Condition()
+
+    def _spawn(self, proxy):
         opts = Options()
         opts.add_argument("--headless=new")
         opts.add_argument("--no-sandbox")
-        proxy = {'proxy': {'http': PROXY_URL, 'https': PROXY_URL}} if PROXY_URL else None
-        self.d = webdriver.Chrome(options=opts, seleniumwire_options=proxy)
+        blk = ResourceBlocker()
+        with TRACE.span("chrome_start", pooled=True): d = make_driver(opts, blk, proxy)
+        return {"d": d, "blk": blk, "proxy": proxy, "uses": 0, "home": d.current_window_handle}
+
+    def _retire(self, inst):
+        TRACE.add("pool_recycles")
+        try:
+            inst["blk"].report(inst["d"])
+            with TRACE.span("chrome_quit", pooled=True): quit_driver(inst["d"])
+        except Exception: pass
+
+    def acquire(self, proxy="", block=True):
+        """block=False 时池满直接返回 None，调用方自己起独立 Chrome"""
+        spawn, old = False, None
+        with self.cv:
+            while True:
+                inst = next((i for i in self.items if not i["busy"] and i["proxy"] == proxy), None)
+                if inst:
+                    TRACE.add("pool_hits"); inst["busy"] = True; break
+                idle = next((i for i in self.items if not i["busy"]), None)
+                if len(self.items) < self.size or idle:
+                    if idle and len(self.items) >= self.size: self.items.remove(idle); old = idle  # 代理不同的空闲实例让位
+                    inst = {"busy": True, "d": None, "proxy": proxy}; self.items.append(inst); spawn = True
+                    break
+                if not block:
+                    TRACE.add("pool_full"); return None
+                self.cv.wait()
+        if old: self._retire(old)
+        if spawn:
+            try: inst.update(self._spawn(proxy))
+            except Exception:
+                with self.cv: self.items.remove(inst); self.cv.notify_all()
+                raise
+        return self._open(inst)
+
+    def _open(self, inst):
+        d = inst["d"]
+        try:
+            # 独立 context 不落盘 cookie/缓存；池化实例的收益在于进程常驻，磁盘缓存主要惠及单次运行
+            ctx = d.execute_cdp_cmd("Target.createBrowserContext", {})["browserContextId"]
+            tab = d.execute_cdp_cmd("Target.createTarget", {"url": "about:blank", "browserContextId": ctx})["targetId"]
+            d.switch_to.window(tab)
+        except Exception:
+            # 不支持多 context 时退化为清空 cookie 后复用默认标签页
+            ctx = tab = None
+            d.switch_to.window(inst["home"]); d.delete_all_cookies()
+        inst["blk"].attach(d)  # CDP 拦截规则按标签页生效，新标签页要重新挂
+        return Lease(self, inst, ctx, tab)
+
+    def release(self, lease):
+        inst, d = lease.inst, lease.d
+        try:
+            if lease.ctx:
+                d.switch_to.window(inst["home"])
+                d.execute_cdp_cmd("Target.disposeBrowserContext", {"browserContextId": lease.ctx})
+            inst["uses"] += 1
+            mb = proc_tree_rss_mb(d.service.process.pid)
+        except Exception:
+            inst["uses"], mb = self.max_uses, 0
+        retire = inst["uses"] >= self.max_uses or mb > self.max_mb
+        if retire: print(f"♻️ 回收 Chrome 实例: 已用 {inst['uses']} 次 / {mb}MB")
+        with self.cv:
+            if retire: self.items.remove(inst)
+            else: inst["busy"] = False
+            self.cv.notify_all()
+        if retire: self._retire(inst)
+
+    def shutdown(self):
+        with self.cv: items, self.items = self.items, []
+        for inst in items:
+            if inst.get("d"): self._retire(inst)
+
+POOL = None
+
+def enable_pool():
+    global POOL
+    if BROWSER_POOL and POOL is None: POOL = BrowserPool()
+
+# ApiGuard：GH.api 底下的韧性层，按接口超时、GET 退避重试/对冲、全站熔断
+ENDPOINTS = (("renew-free", r"/renew-free$"), ("start", r"/start$"), ("information", r"/information$"),
+             ("contract", r"/contracts/[^/]+$"), ("servers", r"/api/servers$"))
+
+def endpoint(url):
+    path = urlparse(url).path
+    return next((k for k, rx in ENDPOINTS if re.search(rx, path)), "api")
+
+# fetch 带 AbortController 超时；h>0 时首个请求超过 h 毫秒未回就再发一份，谁先到用谁
+API_FETCH_JS = """const one = (u, m, t, hd) => { const c = new AbortController(), timer = setTimeout(() => c.abort(), t);
+  return fetch(u, {method: m, signal: c.signal, headers: hd || {}}).then(async r => ({status: r.status,
+      etag: r.headers.get('ETag'), modified: r.headers.get('Last-Modified'), body: await r.json().catch(() => null)}))
+    .catch(e => ({status: 0, error: e.name === 'AbortError' ? 'timeout' : String(e)})).finally(() => clearTimeout(timer)); };"""
+API_CALL_JS = API_FETCH_JS + """const [u, m, t, h, hd] = arguments;
+if (!h) return one(u, m, t, hd);
+let late, fired = false; const first = one(u, m, t, hd);
+return Promise.race([first, new Promise(ok => late = setTimeout(ok, h))])
+  .then(r => r || (fired = true, Promise.race([first, one(u, m, t, hd).then(x => ({...x, hedged: true}))])))
+  .then(r => ({...r, fired})).finally(() => clearTimeout(late));"""
+API_BATCH_JS = API_FETCH_JS + "return Promise.all(arguments[0].map((u, i) => one(u, 'GET', arguments[1][i])));"
+
+class ApiGuard:
+    def __init__(self, fails=BREAKER_FAILS, cooldown_s=BREAKER_COOLDOWN_S):
+        self.max_fails, self.cooldown_s = fails, cooldown_s
+        self.fails, self.open_until, self.probe_until, self.lock = 0, 0.0, 0.0, threading.Lock()
+
+    def timeout(self, url):
+        return API_TIMEOUTS.get(endpoint(url), API_TIMEOUT_S)
+
+    @property
+    def tripped(self):
+        """熔断中或半开待确认(不占用试探名额)"""
+        return bool(self.open_until)
+
+    def allow(self):
+        """闭合时放行；熔断冷却期内拒绝；冷却过后半开，只放一个试探请求，其余继续拒绝直到试探有结果"""
+        with self.lock:
+            now = time.time()
+            if not self.open_until: return True
+            if now < self.open_until or now < self.probe_until: return False
+            self.probe_until = now + self.cooldown_s  # 试探者异常退出没回报时，过一个冷却期再放下一个
+            TRACE.add("breaker_probes"); print("🧪 熔断冷却结束，放行一个试探请求")
+            return True
+
+    def ok(self):
+        with self.lock: self.fails, self.open_until, self.probe_until = 0, 0.0, 0.0
+
+    def fail(self):
+        with self.lock:
+            self.fails += 1
+            if self.probe_until or (self.fails >= self.max_fails and not self.open_until):
+                self.open_until, self.probe_until = time.time() + self.cooldown_s, 0.0  # 试探失败立即重新熔断
+                TRACE.add("breaker_trips"); print(f"🧯 站点连续失败 {self.fails} 次，熔断 {self.cooldown_s}s")
+
+    @staticmethod
+    def bad(r):
+        return r["status"] == 0 or r["status"] == 429 or r["status"] >= 500
+
+    def settle(self, url, r, raw=False):
+        """单次结果记账并转成业务层的 dict(raw=True 原样返回 status/body/校验头)；失败返回 None"""
+        if r.get("hedged"): TRACE.add("api_hedge_wins")
+        if not self.bad(r):
+            self.ok()
+            if raw: return r
+            body = r["body"] if isinstance(r.get("body"), dict) else {"success": False, "message": f"HTTP {r['status']}", "failed": True}
+            return {**body, "failed": True, "not_found": True} if r["status"] == 404 else body
+        if r.get("error") == "timeout": TRACE.add("api_timeouts")
+        self.fail()
+        return None
+
+    def call(self, send, url, method="GET", raw=False):
+        """send(timeout_s, hedge_ms) -> {"status", "body"|"error"}；GET 按指数退避重试，POST 只发一次"""
+        ep, idem = endpoint(url), method == "GET"
+        if not self.allow():
+            TRACE.add("breaker_rejects")
+            return {"success": False, "message": f"站点熔断中，{max(0, int(max(self.open_until, self.probe_until) - time.time()))}s 后再试", "failed": True, "breaker": True}
+        for n in range(API_RETRIES + 1 if idem else 1):
+            if n:
+                back = API_BACKOFF_S * 2 ** (n - 1) * random.uniform(0.5, 1.5)
+                print(f"🔁 {ep} 第 {n} 次重试，退避 {back:.1f}s"); TRACE.add("api_retries")
+                nap(back)
+                if not self.allow(): break
+            t0 = time.perf_counter()
+            r = send(self.timeout(url), API_HEDGE_MS if idem else 0)
+            TRACE.sample(f"api:{ep}", (time.perf_counter() - t0) * 1000)
+            METRICS.observe("greathost_api_seconds", time.perf_counter() - t0, endpoint=ep)
+            res = self.settle(url, r, raw)
+            if res is not None: return res
+        TRACE.add("api_failures")
+        msg = r.get("error") or f"HTTP {r['status']}"
+        # failed 标记传输/协议层失败(区别于站点返回的业务失败)；POST 超时/5xx 时请求可能已经生效，交给调用方回读确认，绝不重发
+        return {"success": False, "message": msg, "failed": True, **({} if idem or r["status"] == 429 else {"uncertain": True})}
+
+GUARD = ApiGuard()
+
+class GH:
+    def __init__(self, email=EMAIL, password=PASSWORD, proxy="", lease=None):
+        self.email, self.password, self.proxy = email, password, proxy
+        # 这里可能持有舰队的 gsem，不能阻塞等池子；要等的租约由 fleet_account 在 gsem 之外先拿好传进来
+        self.lease = lease or (POOL.acquire(proxy, block=False) if POOL else None)
+        if self.lease:
+            self.d, self.blk = self.lease.d, self.lease.blk
+        else:
+            opts = Options()
+            opts.add_argument("--headless=new")
+            opts.add_argument("--no-sandbox")
+            self.blk = ResourceBlocker()
+            with TRACE.span("chrome_start"): self.d = make_driver(opts, self.blk, proxy)
         self.w = WebDriverWait(self.d, 25)
+        self.d.set_script_timeout(max([API_TIMEOUT_S, *API_TIMEOUTS.values()]) + 10)
+        self.rt = {"calls": 0, "secs": 0.0}
+        self.dom_lock = threading.Lock()
+
+    @contextmanager
+    def timed(self, name, **attrs):
+        """一次网络往返：计入 rt 统计并记录 span"""
+        t0 = time.time()
+        try:
+            with TRACE.span(name, **attrs): yield
+        finally:
+            self.rt["calls"] += 1; self.rt["secs"] += time.time() - t0
+
+    def _send(self, url, method, timeout_s, hedge_ms=0, headers=None):
+        try: r = self.d.execute_script(API_CALL_JS, url, method, int(timeout_s * 1000), hedge_ms, headers)
+        except Exception as e: return {"status": 0, "error": str(e)[:200]}
+        if r.get("fired"): TRACE.add("api_hedges")
+        TRACE.add("api_bytes", len(json.dumps(r.get("body"), ensure_ascii=False)))
+        return r
 
     def api(self, url, method="GET"):
         print(f"📡 API 调用 [{method}] {url}")
-        script = f"return fetch('{url}',{{method:'{method}'}}).then(r=>r.json()).catch(e=>({{success:false,message:e.toString()}}))"
-        return self.d.execute_script(script)
+        with self.timed("api", url=url, method=method, endpoint=endpoint(url)):
+            return GUARD.call(lambda t, h: self._send(url, method, t, h), url, method)
+
+    def api_cond(self, url, etag="", modified=""):
+        """带 If-None-Match / If-Modified-Since 的 GET；返回 {"status", "body", "etag", "modified"}，304 时 body 为空"""
+        hd = {k: v for k, v in (("If-None-Match", etag), ("If-Modified-Since", modified)) if v} or None
+        print(f"📡 API 调用 [GET{' 条件' if hd else ''}] {url}")
+        with self.timed("api", url=url, method="GET", endpoint=endpoint(url), conditional=bool(hd)):
+            return GUARD.call(lambda t, h: self._send(url, "GET", t, h, hd), url, raw=True)
+
+    def batch(self, urls):
+        """一次 execute_script 用 Promise.all 并行拉取多个 GET 接口，只算一次往返；失败的单独走带重试的 api()"""
+        if GUARD.tripped: return [self.api(u) for u in urls]
+        print(f"📡 API 批量调用 [GET] {' + '.join(urls)}")
+        with self.timed("api_batch", urls=urls):
+            try: raw = self.d.execute_script(API_BATCH_JS, urls, [int(GUARD.timeout(u) * 1000) for u in urls])
+            except Exception as e: raw = [{"status": 0, "error": str(e)[:200]}] * len(urls)
+        TRACE.add("api_bytes", len(json.dumps([r.get("body") for r in raw], ensure_ascii=False)))
+        out = [GUARD.settle(u, r) for u, r in zip(urls, raw)]
+        return [res if res is not None else self.api(u) for u, res in zip(urls, out)]
 
     def get_ip(self):
         try:
-            self.d.get("https://api.ipify.org?format=json")
+            with TRACE.span("get_ip"): self.d.get(IP_CHECK_URL)
             ip = json.loads(self.d.find_element(By.TAG_NAME, "body").text).get("ip", "Unknown")
             print(f"🌐 落地 IP: {ip}")
             return ip
@@ -82,31 +1186,54 @@ class GH:
             return "Unknown"
 
     def login(self):
-        print(f"🔑 正在登录: {EMAIL[:3]}***...")
-        self.d.get("https://greathost.es/login")
-        self.w.until(EC.presence_of_element_located((By.NAME, "email"))).send_keys(EMAIL)
-        self.d.find_element(By.NAME, "password").send_keys(PASSWORD)
+        t0 = time.perf_counter()
+        cookies = SESSIONS.load(self.email, self.password)
+        if cookies:
+            with TRACE.span("session_restore"): ok = self.restore(cookies)
+            if ok:
+                print("♻️ 缓存会话有效，跳过登录")
+                return METRICS.observe("greathost_login_seconds", time.perf_counter() - t0, how="cache")
+            if ok is None:
+                print("❔ 会话校验失败(站点/网络异常)，保留缓存并尝试重新登录")
+            else:
+                print("⌛ 缓存会话已失效，重新登录")
+                SESSIONS.drop(self.email)
+        with TRACE.span("login"): self.do_login()
+        METRICS.observe("greathost_login_seconds", time.perf_counter() - t0, how="full")
+        SESSIONS.save(self.email, self.password, self.cookies())
+
+    def restore(self, cookies):
+        self.d.get(f"{BASE_URL}/login"); page_timing(self.d, "/login")
+        return driver_restore(self.d, cookies)
+
+    def cookies(self):
+        return driver_cookies(self.d)
+
+    def do_login(self):
+        print(f"🔑 正在登录: {self.email[:3]}***...")
+        self.d.get(f"{BASE_URL}/login"); page_timing(self.d, "/login")
+        self.w.until(EC.presence_of_element_located((By.NAME, "email"))).send_keys(self.email)
+        self.d.find_element(By.NAME, "password").send_keys(self.password)
         self.d.find_element(By.CSS_SELECTOR, "button[type='submit']").click()
         self.w.until(EC.url_contains("/dashboard"))
 
-    def get_server(self):
-        servers = self.api("/api/servers").get("servers", [])
-        return next((s for s in servers if s.get("name") == TARGET_NAME), None)
-
-    def get_status(self, sid):
-        info = self.api(f"/api/servers/{sid}/information")
-        st = info.get("status", "unknown").lower()
-        icon, name = STATUS_MAP.get(st, ["❓", st])
-        print(f"📋 状态核对: {TARGET_NAME} | {icon} {name}")
-        return icon, name
+    def get_server(self, name=TARGET_NAME):
+        return INVENTORY.lookup(self, [name]).get(name)
 
     def get_renew_info(self, sid):
-        data = self.api(f"/api/renewal/contracts/{sid}")
-        print(f"DEBUG: 原始合同数据 -> {str(data)[:100]}...")
-        return data.get("contract", {}).get("renewalInfo") or data.get("renewalInfo", {})
+        return renewal_info(self.api(f"/api/renewal/contracts/{sid}"))
+
+    def snapshot(self, sid):
+        """状态 + 合同一次并行拉取，返回 (information, contract 原始数据)；information 在 META_TTL_S 内直接用缓存"""
+        info = INVENTORY.info(self.email, sid)
+        if info is not None: return info, self.api(f"/api/renewal/contracts/{sid}")
+        info, data = self.batch([f"/api/servers/{sid}/information", f"/api/renewal/contracts/{sid}"])
+        INVENTORY.put_info(self.email, sid, info)
+        return info, data
 
     def get_btn(self, sid):
-        self.d.get(f"https://greathost.es/contracts/{sid}")
+        with self.timed("contract_page", sid=sid): self.d.get(f"{BASE_URL}/contracts/{sid}")
+        page_timing(self.d, "/contracts/{sid}")
         btn = self.w.until(EC.presence_of_element_located((By.ID, "renew-free-server-btn")))
         self.w.until(lambda d: btn.text.strip() != "")
         
@@ -114,61 +1241,584 @@ class GH:
         print(f"🔘 按钮状态: '{btn_text}'")
         return btn_text
 
-    def renew(self, sid):
+    def renew(self, sid, before=None):
         print(f"🚀 正在执行续期 POST...")
-        return self.api(f"/api/renewal/contracts/{sid}/renew-free", "POST")
+        r = self.api(f"/api/renewal/contracts/{sid}/renew-free", "POST")
+        if r.get("uncertain") and before is not None:
+            # 不知道 POST 有没有落地：不重发，回读合同看小时数有没有涨
+            info = self.get_renew_info(sid)
+            if calculate_hours(info.get("nextRenewalDate")) > before:
+                print("🔎 续期响应丢失，回读合同确认已生效"); TRACE.add("renew_confirmed_by_readback")
+                return {"success": True, "message": "续期已生效(回读合同确认)", "details": info}
+        return r
+
+    def driver(self):
+        return self.d
 
     def close(self):
-        self.d.quit()
+        if self.lease: return self.lease.release()
+        self.blk.report(self.d)
+        with TRACE.span("chrome_quit"): quit_driver(self.d)
 
-def run():
-    gh = GH()
+class HttpGH(GH):
+    """纯 HTTP 引擎：接口与 GH 一致，用连接池 Session 代替整套 Chrome"""
+    def __init__(self, email=EMAIL, password=PASSWORD, proxy=""):
+        self.email, self.password = email, password
+        self.s = requests.Session()
+        self.s.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        self.s.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        self.s.headers.update({"User-Agent": UA, "Accept": "application/json, text/html;q=0.9"})
+        self.use_proxy(proxy)
+        self.rt = {"calls": 0, "secs": 0.0}
+        self.dom, self.dom_lock = None, threading.Lock()
+
+    def use_proxy(self, proxy):
+        self.proxy = proxy
+        self.s.proxies = {"http": proxy, "https": proxy} if proxy else {}
+
+    def _once(self, url, method, timeout_s, headers=None):
+        try:
+            try:
+                r = self.s.request(method, f"{BASE_URL}{url}", timeout=timeout_s, headers=headers)
+            except (requests.exceptions.ProxyError, requests.exceptions.ConnectTimeout) as e:
+                # 请求还没送到站点，换代理重发对 POST 也安全
+                nxt = self.proxy and PROXIES.failover(self.proxy, e)
+                if not nxt: raise
+                self.use_proxy(nxt)
+                r = self.s.request(method, f"{BASE_URL}{url}", timeout=timeout_s, headers=headers)
+            TRACE.add("api_bytes", len(r.content))
+            try: body = r.json()
+            except ValueError: body = None
+            return {"status": r.status_code, "body": body, "etag": r.headers.get("ETag"), "modified": r.headers.get("Last-Modified")}
+        except requests.exceptions.Timeout:
+            return {"status": 0, "error": "timeout"}
+        except Exception as e:
+            return {"status": 0, "error": str(e)[:200]}
+
+    def _send(self, url, method, timeout_s, hedge_ms=0, headers=None):
+        if not hedge_ms: return self._once(url, method, timeout_s, headers)
+        ex = ThreadPoolExecutor(2)
+        try:
+            first = ex.submit(self._once, url, method, timeout_s, headers)
+            done, _ = wait([first], timeout=hedge_ms / 1000)
+            if done: return first.result()
+            TRACE.add("api_hedges")
+            second = ex.submit(self._once, url, method, timeout_s, headers)
+            done, _ = wait([first, second], return_when=FIRST_COMPLETED)
+            return {**second.result(), "hedged": True} if second in done and first not in done else first.result()
+        finally:
+            ex.shutdown(wait=False)
+
+    def batch(self, urls):
+        with ThreadPoolExecutor(len(urls)) as ex:
+            return list(ex.map(self.api, urls))
+
+    def get_ip(self):
+        try:
+            with TRACE.span("get_ip"): ip = self.s.get(IP_CHECK_URL, timeout=15).json().get("ip", "Unknown")
+            print(f"🌐 落地 IP: {ip}")
+            return ip
+        except:
+            print("🌐 落地 IP: 无法获取")
+            return "Unknown"
+
+    def restore(self, cookies):
+        for c in cookies:
+            self.s.cookies.set(c["name"], c["value"], domain=c.get("domain", ""), path=c.get("path", "/"))
+        try:
+            r = self.s.get(f"{BASE_URL}/api/servers", timeout=15, allow_redirects=False)
+        except Exception:
+            return None
+        return session_state(r.status_code, r.headers.get("content-type", ""))
+
+    def cookies(self):
+        return [{"name": c.name, "value": c.value, "domain": c.domain, "path": c.path, **({"expiry": int(c.expires)} if c.expires else {})} for c in self.s.cookies]
+
+    def do_login(self):
+        self.s.cookies.clear()
+        print(f"🔑 正在登录(HTTP): {self.email[:3]}***...")
+        page = self.s.get(f"{BASE_URL}/login", timeout=25).text
+        form = re.search(r'<form[^>]*action=["\']([^"\']+)', page)
+        data = {"email": self.email, "password": self.password}
+        for k, v in re.findall(r'<input[^>]*type=["\']hidden["\'][^>]*name=["\']([^"\']+)["\'][^>]*value=["\']([^"\']*)', page):
+            data.setdefault(k, v)
+        action = form.group(1) if form else "/login"
+        r = self.s.post(action if action.startswith("http") else f"{BASE_URL}{action}", data=data, timeout=25)
+        if "/dashboard" not in r.url: raise Exception(f"HTTP 登录未跳转 dashboard (停在 {r.url})")
+
+    def get_btn(self, sid):
+        with self.timed("contract_page", sid=sid): html = self.s.get(f"{BASE_URL}/contracts/{sid}", timeout=25).text
+        m = re.search(r'id=["\']renew-free-server-btn["\'][^>]*>(.*?)</button>', html, re.S)
+        btn_text = re.sub(r'<[^>]+>|\s+', ' ', m.group(1)).strip() if m else ""
+        print(f"🔘 按钮状态: '{btn_text}'")
+        return btn_text
+
+    def driver(self):
+        """DOM 路径要真浏览器：按需起 Chrome 并带上 HTTP 会话的 cookie，调用方持有 dom_lock"""
+        if not self.dom:
+            self.dom = GH(self.email, self.password, self.proxy)
+            if not self.dom.restore(self.cookies()): self.dom.do_login()
+        return self.dom.d
+
+    def close(self):
+        self.s.close()
+        if self.dom: self.dom.close()
+
+def open_gh(email=EMAIL, password=PASSWORD, lease=None):
+    """从代理池取最快的健康代理打开引擎；代理中途挂掉就切下一个重来。lease 只给第一次尝试用"""
+    for _ in range(max(1, len(PROXIES.urls))):
+        proxy = PROXIES.current()
+        use, lease = lease, None
+        if use and use.inst["proxy"] != proxy: use.release(); use = None
+        try:
+            return _open_gh(email, password, proxy, use)
+        except Exception as e:
+            if not (proxy and proxy_error(e) and PROXIES.failover(proxy, e)): raise
+
+def _open_gh(email, password, proxy, lease=None):
+    """按 ENGINE 选择引擎，HTTP 登录失败时回退到 Chrome；返回 (gh, 落地 IP)"""
+    if ENGINE == "http":
+        gh = HttpGH(email, password, proxy)
+        try:
+            ip = gh.get_ip(); gh.login()
+            return gh, ip
+        except Exception as e:
+            print(f"⚠️ HTTP 引擎不可用，回退 Chrome: {e}")
+            TRACE.add("engine_fallbacks")
+            gh.close()
+    gh = GH(email, password, proxy, lease)
     try:
-        ip = gh.get_ip()
-        gh.login()
-        srv = gh.get_server()
-        if not srv: raise Exception(f"未找到服务器 {TARGET_NAME}")
-        sid = srv["id"]
-        print(f"✅ 已锁定目标服务器: {TARGET_NAME} (ID: {sid})")
-
-        icon, stname = gh.get_status(sid)
-        status_disp = f"{icon} {stname}"
+        ip = gh.get_ip(); gh.login()
+        return gh, ip
+    except:
+        gh.close(); raise
+
+def usage_line(t0):
+    me, kids = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = me.ru_utime + me.ru_stime + kids.ru_utime + kids.ru_stime
+    return f"⏱️ 总耗时 {time.time() - t0:.1f}s | CPU {cpu:.1f}s | 峰值内存 本进程 {me.ru_maxrss // 1024}MB / 子进程 {kids.ru_maxrss // 1024}MB"
+
+def status_of(info, label=TARGET_NAME):
+    st = info.get("status", "unknown").lower()
+    icon, name = STATUS_MAP.get(st, ["❓", st])
+    print(f"📋 状态核对: {label} | {icon} {name}")
+    return icon, name
+
+def renewal_info(data):
+    print(f"DEBUG: 原始合同数据 -> {str(data)[:100]}...")
+    return data.get("contract", {}).get("renewalInfo") or data.get("renewalInfo", {})
+
+def cooldown_from_contract(info):
+    """从合同 renewalInfo 推出免费续期冷却秒数；字段不存在时返回 None，由调用方回退到按钮页面"""
+    for k in ("freeRenewalAvailableAt", "nextFreeRenewalAt", "cooldownUntil", "canRenewAt"):
+        if info.get(k):
+            try:
+                at = datetime.fromisoformat(re.sub(r'\.\d+Z$', 'Z', info[k]).replace('Z', '+00:00'))
+                return max(0, int((at - datetime.now(timezone.utc)).total_seconds()))
+            except ValueError:
+                pass
+    for k in ("cooldownSeconds", "cooldownRemaining"):
+        if isinstance(info.get(k), (int, float)): return max(0, int(info[k]))
+    if info.get("canRenewFree") is True: return 0
+    return None
+
+def parse_wait(text):
+    """把 'Wait 1 hour 20 minutes' 之类的冷却文案换算成秒"""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    return sum(int(n) * units[u[0].lower()] for n, u in re.findall(r"(\d+)\s*(sec|min|hour|day|[smhd])", text or "", re.I))
+
+# History：每台服务器每次运行一条记录，支撑免浏览器预检与趋势查询
+class History:
+    def __init__(self, path):
+        self.path, self.lock, self.ready = path, threading.Lock(), False  # 导入时不碰磁盘，第一次用到才建库
+
+    @contextmanager
+    def _db(self):
+        db = sqlite3.connect(self.path, timeout=10); db.row_factory = sqlite3.Row
+        try:
+            with db:
+                if not self.ready:
+                    db.execute("""CREATE TABLE IF NOT EXISTS runs (ts REAL, account TEXT, server TEXT, sid TEXT, engine TEXT,
+                                  kind TEXT, before INTEGER, after INTEGER, cooldown_s INTEGER, latency_s REAL, message TEXT)""")
+                    db.execute("CREATE INDEX IF NOT EXISTS runs_acct_server ON runs (account, server, ts)")
+                    self.ready = True
+                yield db
+        finally:
+            db.close()
+
+    def _acct(self, email):
+        return hashlib.sha256((email or "").lower().encode()).hexdigest()[:12]
+
+    def record(self, email, res, engine=""):
+        if not self.path: return
+        with self.lock, self._db() as db:
+            db.execute("INSERT INTO runs VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+                       (time.time(), self._acct(email), res["name"], res["sid"], engine, res["kind"], res["before"],
+                        res["after"], res.get("cooldown_s", 0), res.get("latency_s", 0), res.get("message", "")[:200]))
+
+    def last(self, email, server):
+        if not self.path: return None
+        with self._db() as db:
+            return db.execute("SELECT * FROM runs WHERE account=? AND server=? AND kind NOT IN ('error','skipped') ORDER BY ts DESC LIMIT 1",
+                              (self._acct(email), server)).fetchone()
+
+    def preflight(self, email, server):
+        """按上次记录推算当前剩余小时；仍高于上限阈值或仍在冷却就返回跳过原因"""
+        row = self.last(email, server)
+        if not row: return None
+        elapsed = time.time() - row["ts"]
+        projected = (row["after"] or row["before"]) - elapsed / 3600
+        if projected > MAX_HOURS: return f"预计剩余 {projected:.0f}h > {MAX_HOURS}h"
+        if row["kind"] in ("cooldown", "renew_success") and (row["cooldown_s"] or 0) > elapsed: return f"冷却还剩 {(row['cooldown_s'] - elapsed) / 60:.0f} 分钟"
+        return None
+
+    def trend(self, server=None, days=7):
+        """最近 N 天的记录，按时间排序，用于趋势报表"""
+        if not self.path: return []
+        sql, args = "SELECT * FROM runs WHERE ts >= ?", [time.time() - days * 86400]
+        if server: sql += " AND server=?"; args.append(server)
+        with self._db() as db:
+            return [dict(r) for r in db.execute(sql + " ORDER BY ts", args)]
+
+    def summary(self, days=7):
+        if not self.path: return []
+        with self._db() as db:
+            return [dict(r) for r in db.execute("""SELECT server, COUNT(*) AS runs, SUM(kind='renew_success') AS renewed,
+                SUM(kind='error') AS errors, SUM(kind='skipped') AS skipped, MIN(after) AS min_hours,
+                ROUND(AVG(latency_s), 2) AS avg_latency_s, MAX(ts) AS last_ts FROM runs WHERE ts >= ? GROUP BY server ORDER BY server""",
+                (time.time() - days * 86400,))]
+
+HISTORY = History(HISTORY_DB)
+
+def print_history(days=7):
+    for r in HISTORY.summary(days):
+        last = datetime.fromtimestamp(r["last_ts"], ZoneInfo("Asia/Shanghai")).strftime('%m/%d %H:%M')
+        print(f"📈 {r['server']} | {r['runs']} 次 | 续期 {r['renewed']} | 报错 {r['errors']} | 跳过 {r['skipped']} | 最低 {r['min_hours']}h | 平均 {r['avg_latency_s']}s | 最近 {last}")
+
+# Inventory：服务器名→ID 索引 + 单台元数据缓存，按 TTL 过期，过期后条件请求增量刷新
+class Inventory:
+    def __init__(self, path=INVENTORY_CACHE):
+        self.path, self.lock = path, threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as f: self.data = json.load(f)
+        except: self.data = {}
+
+    def _slot(self, email):
+        return hashlib.sha256(f"inventory:{email.lower()}".encode()).hexdigest()[:16]  # 缓存里不落明文邮箱
+
+    def _save(self):
+        if not self.path: return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f: json.dump(self.data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def lookup(self, gh, names=(), force=False):
+        """返回 {name: server}；索引未过期且 names 全在里面就不发请求，否则带 ETag/Last-Modified 条件刷新"""
+        with self.lock: acc = self.data.setdefault(self._slot(gh.email), {})
+        idx = acc.get("index")
+        fresh = idx is not None and time.time() - acc.get("ts", 0) < INVENTORY_TTL_S
+        if fresh and not force and all(n in idx for n in names):
+            TRACE.add("inventory_hits")
+            return idx
+        r = gh.api_cond("/api/servers", *((acc.get("etag") or "", acc.get("modified") or "") if idx is not None else ()))
+        if r.get("failed") or (r["status"] != 304 and not isinstance((r.get("body") or {}).get("servers"), list)):
+            if idx is None: raise Exception(f"服务器列表获取失败: {r.get('message') or r.get('status')}")
+            print("⚠️ 服务器列表刷新失败，沿用缓存索引"); return idx
+        with self.lock:
+            if r["status"] == 304:
+                TRACE.add("inventory_not_modified")
+            else:
+                servers = r["body"]["servers"]
+                idx = acc["index"] = {s.get("name"): s for s in servers}
+                keep = {s.get("id") for s in servers}
+                acc["meta"] = {sid: m for sid, m in acc.get("meta", {}).items() if sid in keep}  # 已删除的服务器顺手清掉
+                acc.update(etag=r.get("etag"), modified=r.get("modified"))
+                TRACE.add("inventory_refreshes")
+            acc["ts"] = time.time()
+            self._save()
+        return idx
 
-        info = gh.get_renew_info(sid)
-        before = calculate_hours(info.get("nextRenewalDate"))
+    def info(self, email, sid):
+        if not META_TTL_S: return None
+        with self.lock: m = self.data.get(self._slot(email), {}).get("meta", {}).get(sid)
+        if m and time.time() - m["ts"] < META_TTL_S:
+            TRACE.add("meta_hits")
+            return m["info"]
+        return None
 
-        btn = gh.get_btn(sid)
-        print(f"🔘 按钮状态: '{btn}' | 剩余: {before}h")
+    def put_info(self, email, sid, info):
+        if not (META_TTL_S and info.get("status")) or info.get("failed"): return
+        with self.lock:
+            self.data.setdefault(self._slot(email), {}).setdefault("meta", {})[sid] = {"info": info, "ts": time.time()}
+            self._save()
+
+    def drop(self, email, name=None, sid=None):
+        """该服务器接口 404：ID 可能已变(被删了重建)，只清掉这一条，并去掉校验头让下次完整拉取；其余条目仍可兜底"""
+        with self.lock:
+            acc = self.data.get(self._slot(email))
+            if not acc: return
+            idx = acc.get("index") or {}
+            if name in idx and (sid is None or idx[name].get("id") == sid): del idx[name]
+            acc.get("meta", {}).pop(sid, None)
+            acc.update(etag=None, modified=None, ts=0)
+            self._save()
+
+INVENTORY = Inventory(INVENTORY_CACHE)
+
+# Strategy：API 与页面(DOM)两条续期路径同一接口，引擎按近期成功率/延迟挑最快能用的
+class ServerGone(Exception):
+    """接口对这台服务器返回 404/not found：换路径也没用，直接上抛"""
+
+class StrategySkip(Exception):
+    """本次没真正试(如熔断中)，换下一条路径但不记失败"""
+
+class RenewUncertain(Exception):
+    """续期 POST 可能已经落地：不能换路径再点一次，只能回读确认"""
+
+class ApiStrategy:
+    name = "api"
+
+    def __init__(self, gh):
+        self.gh = gh
+
+    @staticmethod
+    def _ok(data):
+        if data.get("breaker"): raise StrategySkip(data.get("message"))
+        if data.get("not_found") or (data.get("failed") or data.get("success") is False) and "not found" in str(data.get("message", "")).lower():
+            raise ServerGone(f"服务器不存在: {data.get('message')}")
+        if data.get("failed"): raise Exception(f"接口失败: {data.get('message')}")
+        return data
+
+    def hours(self, srv):
+        info = renewal_info(self._ok(self.gh.api(f"/api/renewal/contracts/{srv['id']}")))
+        if not info.get("nextRenewalDate"): raise Exception("合同数据缺少 nextRenewalDate")
+        return calculate_hours(info["nextRenewalDate"])
+
+    def status(self, srv):
+        data = self._ok(self.gh.api(f"/api/servers/{srv['id']}/information"))
+        if not data.get("status"): raise Exception("状态接口缺少 status")
+        return data["status"].lower()
+
+    def cooldown(self, srv):
+        return self.read(srv)["cooldown_s"]
+
+    def read(self, srv):
+        """状态 + 合同一次并行拉取；合同里没有冷却字段才去合同页读按钮"""
+        raw_info, raw_contract = map(self._ok, self.gh.snapshot(srv["id"]))
+        info = renewal_info(raw_contract)
+        if not info.get("nextRenewalDate") or not raw_info.get("status"): raise Exception("接口数据缺少 nextRenewalDate/status")
+        cd = cooldown_from_contract(info)
+        btn = self.gh.get_btn(srv["id"]) if cd is None else f"Wait {-(-cd // 60)} minutes" if cd else "Renew"
+        return {"hours": calculate_hours(info["nextRenewalDate"]), "status": raw_info["status"].lower(),
+                "cooldown_s": parse_wait(btn) if cd is None else cd, "btn": btn}
+
+    def renew(self, srv, before):
+        r = self.gh.renew(srv["id"], before)
+        if r.get("uncertain"): raise RenewUncertain(r.get("message"))
+        self._ok(r)
+        ok = bool(r.get("success"))
+        return {"success": ok, "message": r.get("message", "无返回消息"),
+                "after": calculate_hours(r.get("details", {}).get("nextRenewalDate")) if ok else before}
+
+class DomStrategy:
+    """照备份脚本的做法读页面、点按钮，不依赖 JSON 接口"""
+    name = "dom"
+    HOURS_JS = "return (document.querySelector('#accumulated-time') || {textContent: ''}).textContent;"
+    BTN_JS = "return (document.querySelector('#renew-free-server-btn') || {textContent: ''}).textContent.trim();"
+    STATUS_JS = """const cards = [...document.querySelectorAll('.server-card')], name = arguments[0];
+const card = cards.find(c => c.textContent.includes(name)) || document;
+const ind = card.querySelector('.server-status-indicator'); return ind ? ind.getAttribute('title') : null;"""
+
+    def __init__(self, gh):
+        self.gh = gh
+
+    def _contract(self, srv, fresh=False):
+        d = self.gh.driver()
+        if fresh or not d.current_url.rstrip("/").endswith(f"/contracts/{srv['id']}"):
+            d.get(f"{BASE_URL}/contracts/{srv['id']}"); page_timing(d, "/contracts/{sid}")
+        WebDriverWait(d, 15, poll_frequency=0.1).until(lambda x: re.search(r"\d", x.execute_script(self.HOURS_JS) or "") and x.execute_script(self.BTN_JS))
+        return d
+
+    def hours(self, srv):
+        with self.gh.dom_lock:
+            return int(re.sub(r"\D", "", self._contract(srv).execute_script(self.HOURS_JS)))
+
+    def cooldown(self, srv):
+        with self.gh.dom_lock:
+            return parse_wait(self._contract(srv).execute_script(self.BTN_JS))
+
+    def status(self, srv):
+        with self.gh.dom_lock:
+            d = self.gh.driver()
+            d.get(f"{BASE_URL}/dashboard")
+            st = WebDriverWait(d, 15, poll_frequency=0.1).until(lambda x: x.execute_script(self.STATUS_JS, srv.get("name") or ""))
+            return st.strip().lower()
+
+    def read(self, srv):
+        st = self.status(srv)
+        with self.gh.dom_lock:
+            d = self._contract(srv, fresh=True)
+            btn = d.execute_script(self.BTN_JS)
+            return {"hours": int(re.sub(r"\D", "", d.execute_script(self.HOURS_JS))), "status": st, "cooldown_s": parse_wait(btn), "btn": btn}
+
+    def renew(self, srv, before):
+        with self.gh.dom_lock:
+            d = self._contract(srv)
+            btn = d.execute_script(self.BTN_JS)
+            if "Wait" in btn: return {"success": False, "message": btn, "after": before}
+            d.find_element(By.ID, "renew-free-server-btn").click()
+            wait_mutation(d, "#accumulated-time", "5 días", 15)
+            after = int(re.sub(r"\D", "", d.execute_script(self.HOURS_JS)) or before)
+            alert = d.execute_script("const a = document.querySelector('.alert'); return a ? a.textContent.trim() : '';")
+            msg = "No puedes renovar más de 5 días" if "5 días" in d.execute_script("return document.body.innerText;") else alert
+            return {"success": after > before, "message": msg or f"{before} ➔ {after}h", "after": after}
+
+class StrategyEngine:
+    KINDS = {"api": ApiStrategy, "dom": DomStrategy}
+
+    def __init__(self, names=STRATEGIES, path=STRATEGY_CACHE):
+        self.names = [n.strip() for n in names.split(",") if n.strip() in self.KINDS]
+        self.path, self.lock = path, threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as f: data = json.load(f)
+        except: data = {}
+        # {引擎: {路径: {操作: 统计}}}：Chrome 下量出的 DOM 延迟对 HttpGH(DOM 要冷启动 Chrome)没有参考价值；旧格式直接丢弃
+        self.stats = {e: v for e, v in data.items() if e not in self.KINDS and isinstance(v, dict)}
+
+    def _save(self):
+        if not self.path: return
+        with open(self.path, "w", encoding="utf-8") as f: json.dump(self.stats, f)
+
+    def _st(self, engine, name, op):
+        return self.stats.get(engine, {}).get(name, {}).get(op, {})
+
+    def healthy(self, engine, name, op):
+        """连续失败 2 次后暂停，STRATEGY_RETRY_S 后放一次试探，再失败重新计时"""
+        st = self._st(engine, name, op)
+        return st.get("streak", 0) < 2 or time.time() - st.get("last_fail", 0) > STRATEGY_RETRY_S
+
+    def order(self, engine, op):
+        """能用的排前面，其中按该引擎下该操作的平滑延迟从快到慢(没跑通过的排在有数据的后面)；全都不健康时也照常按顺序兜底"""
+        return sorted(self.names, key=lambda n: (not self.healthy(engine, n, op), self._st(engine, n, op).get("ewma_ms", float("inf")), self.names.index(n)))
+
+    def record(self, engine, name, op, ok, ms):
+        with self.lock:
+            st = self.stats.setdefault(engine, {}).setdefault(name, {}).setdefault(op, {"ok": 0, "fail": 0, "streak": 0})
+            if ok:
+                st["ok"] += 1; st["streak"] = 0
+                st["ewma_ms"] = round(ms if "ewma_ms" not in st else 0.7 * st["ewma_ms"] + 0.3 * ms, 1)
+            else:
+                st["fail"] += 1; st["streak"] += 1; st["last_fail"] = time.time()
+            self._save()
+        TRACE.add(f"strategy_{name}_{'ok' if ok else 'fail'}"); TRACE.sample(f"strategy:{name}:{op}", ms)
+
+    def run(self, gh, op, *args):
+        """按 order(engine, op) 依次尝试，返回 (结果, 用到的路径名)"""
+        cache, engine = gh.__dict__.setdefault("strategies", {}), type(gh).__name__
+        err = None
+        for name in self.order(engine, op):
+            strat = cache.get(name) or cache.setdefault(name, self.KINDS[name](gh))
+            t0 = time.perf_counter()
+            try:
+                out = getattr(strat, op)(*args)
+            except ServerGone: raise
+            except StrategySkip as e:
+                err = e; print(f"↪️ {name} 路径 {op} 跳过({str(e)[:80]})，尝试下一条")
+                continue
+            except RenewUncertain as e:
+                # 不换路径重发：回读当前状态，小时数涨了就算成功
+                self.record(engine, name, op, False, (time.perf_counter() - t0) * 1000)
+                srv, before = args
+                print(f"❔ 续期结果不明({str(e)[:60]})，回读确认，不再重试")
+                st, via = self.run(gh, "read", srv)
+                return {"success": st["hours"] > before, "message": f"续期结果不明，回读剩余 {st['hours']}h", "after": st["hours"]}, via
+            except Exception as e:
+                self.record(engine, name, op, False, (time.perf_counter() - t0) * 1000); err = e
+                print(f"↪️ {name} 路径 {op} 失败({str(e)[:80]})，尝试下一条")
+                continue
+            self.record(engine, name, op, True, (time.perf_counter() - t0) * 1000)
+            return out, name
+        raise err or Exception("没有可用的续期路径")
+
+    def summary(self):
+        return {e: {n: {op: {**st, "rate": round(st["ok"] / max(1, st["ok"] + st["fail"]), 3)} for op, st in ops.items()}
+                    for n, ops in names.items()} for e, names in self.stats.items()}
+
+STRATS = StrategyEngine()
+
+def renew_target(gh, name, ip, srv=None, acct=None):
+    t0 = time.time()
+    res = _renew_target(gh, name, ip, srv, acct)
+    res["latency_s"] = round(time.time() - t0, 3)
+    try: HISTORY.record(gh.email, res, type(gh).__name__)
+    except Exception as e: print(f"⚠️ 历史记录写入失败: {e}")
+    METRICS.inc("greathost_renewals_total", kind=res["kind"]); METRICS.server({**res, "account": res["account"] or gh.email})
+    return res
+
+def public(results):
+    """写进运行报告/FLEET_RESULT(会作为 artifact 上传)的结果：邮箱换成和指标一样的打码形式"""
+    return [{**r, "account": METRICS.account(r["account"])} if r.get("account") else r for r in results]
+
+def skipped(email, name, why):
+    print(f"⏭️ {name}: {why}，跳过本次运行")
+    res = {"account": email, "name": name, "sid": None, "kind": "skipped", "before": 0, "after": 0, "cooldown_s": 0, "message": why}
+    HISTORY.record(email, res, "preflight")
+    METRICS.inc("greathost_renewals_total", kind="skipped")
+    return res
+
+def _renew_target(gh, name, ip, srv=None, acct=None):
+    """续期单台服务器并发送通知，返回结果 dict（供单机/舰队模式汇总）"""
+    res = {"account": acct, "name": name, "sid": None, "kind": "error", "before": 0, "after": 0, "cooldown_s": 0, "message": ""}
+    who = [("👤", "账号", f"{acct[:3]}***")] if acct else []
+    try:
+        srv = srv or gh.get_server(name)
+        if not srv: raise Exception(f"未找到服务器 {name}")
+        sid = res["sid"] = srv["id"]
+        print(f"✅ 已锁定目标服务器: {name} (ID: {sid})")
+
+        rt0 = dict(gh.rt)
+        st, via = STRATS.run(gh, "read", srv)
+        icon, stname = status_of(st, name)
+        status_disp = f"{icon} {stname}"
+        res["status"], res["strategy"] = st["status"], via
+        before = res["before"] = res["after"] = st["hours"]
+        btn = st["btn"]
+        print(f"🔘 按钮状态: '{btn}' | 剩余: {before}h | 路径 {via} | 往返 {gh.rt['calls'] - rt0['calls']} 次 / {gh.rt['secs'] - rt0['secs']:.2f}s")
 
         if "Wait" in btn:
             m = re.search(r"Wait\s+(\d+\s+\w+)", btn)
-            send_notice("cooldown", [
-                ("📛","服务器名称",TARGET_NAME),
+            res.update(kind="cooldown", message=m.group(1) if m else btn, cooldown_s=parse_wait(btn))
+            send_notice("cooldown", who + [
+                ("📛","服务器名称",name),
                 ("🆔","ID",f"<code>{sid}</code>"),
-                ("⏳","冷却时间",m.group(1) if m else btn),
+                ("⏳","冷却时间",res["message"]),
                 ("📊","当前累计",f"{before}h"),
                 ("🚀","服务器状态",status_disp)
             ])
-            return
+            return res
 
-        res = gh.renew(sid)
-        ok = res.get("success", False)
-        msg = res.get("message", "无返回消息")
-        after = calculate_hours(res.get("details", {}).get("nextRenewalDate")) if ok else before
-        print(f"📡 续期响应结果: {ok} | Date='{res.get('details',{}).get('nextRenewalDate')}' | Message='{msg}'")
+        r, via = STRATS.run(gh, "renew", srv, before)
+        ok, msg = r["success"], r["message"]
+        res["message"], res["strategy"] = msg, via
+        after = res["after"] = r["after"] if ok else before
+        print(f"📡 续期响应结果: {ok} | 剩余 {after}h | 路径 {via} | Message='{msg}'")
 
         if ok and after > before:
-            send_notice("renew_success", [
-                ("📛","服务器名称",TARGET_NAME),
+            res["kind"] = "renew_success"
+            try: res["cooldown_s"] = STRATS.run(gh, "cooldown", srv)[0]  # 续期后的冷却，常驻模式按它排下次唤醒
+            except Exception as e: res["cooldown_s"] = None; print(f"⚠️ 续期后冷却读取失败: {str(e)[:60]}")
+            send_notice("renew_success", who + [
+                ("📛","服务器名称",name),
                 ("🆔","ID",f"<code>{sid}</code>"),
                 ("⏰","增加时间",f"{before} ➔ {after}h"),
                 ("🚀","服务器状态",status_disp),
                 ("💡","提示",msg),
                 ("🌐","落地 IP",f"<code>{ip}</code>")
             ])
-        elif "5 d" in msg or before > 108:
-            send_notice("maxed_out", [
-                ("📛","服务器名称",TARGET_NAME),
+        elif "5 d" in msg or before > MAX_HOURS:
+            res["kind"] = "maxed_out"
+            send_notice("maxed_out", who + [
+                ("📛","服务器名称",name),
                 ("🆔","ID",f"<code>{sid}</code>"),
                 ("⏰","剩余时间",f"{after}h"),
                 ("🚀","服务器状态",status_disp),
@@ -176,14 +1826,36 @@ def run():
                 ("🌐","落地 IP",f"<code>{ip}</code>")
             ])
         else:
-            send_notice("renew_failed", [
-                ("📛","服务器名称",TARGET_NAME),
+            res["kind"] = "renew_failed"
+            send_notice("renew_failed", who + [
+                ("📛","服务器名称",name),
                 ("🆔","ID",f"<code>{sid}</code>"),
                 ("🚀","服务器状态",status_disp),
                 ("⏰","剩余时间",f"{before}h"),
                 ("💡","提示",msg),
                 ("🌐","落地 IP",f"<code>{ip}</code>")
             ])
+    except Exception as e:
+        print(f"🚨 运行异常: {e}")
+        res["message"] = str(e)[:100]
+        if isinstance(e, ServerGone): INVENTORY.drop(gh.email, name, res["sid"])
+        send_notice("error", who + [
+            ("📛", "服务器名称", name),
+            ("❌", "故障", f"<code>{str(e)[:100]}</code>"),
+            ("🌐", "代理状态", "已尝试直连")
+        ])
+    return res
+
+def run():
+    t0 = time.time()
+    TRACE.start_profile()
+    try:
+        why = HISTORY.preflight(EMAIL, TARGET_NAME)
+        if why:
+            res = skipped(EMAIL, TARGET_NAME, why)
+            return
+        gh, ip = open_gh()
+        res = renew_target(gh, TARGET_NAME, ip)
     except Exception as e:
         print(f"🚨 运行异常: {e}")
         # 因为 send_notice 内部已经强制直连，所以这里直接调就行，代码清爽多了
@@ -196,8 +1868,218 @@ def run():
     finally:
         # 增加一个判断，防止 gh 没初始化成功导致报错
         if 'gh' in locals():
+            print(f"📶 API 往返: {gh.rt['calls']} 次 / {gh.rt['secs']:.2f}s | 重试 {TRACE.counters.get('api_retries', 0)} 次 | 对冲 {TRACE.counters.get('api_hedges', 0)} 次")
             try: gh.close()
             except: pass
+        PROFILES.prune()
+        OUTBOX.flush()
+        METRICS.observe("greathost_run_seconds", time.time() - t0, mode="once"); METRICS.write_textfile()
+        print(usage_line(t0))
+        TRACE.write(mode="once", engine=type(gh).__name__ if 'gh' in locals() else None, strategies=STRATS.summary(), results=public([res]) if 'res' in locals() else [])
+
+# Fleet：多账号 × 多服务器并发续期
+def load_accounts():
+    """ACCOUNTS(JSON 字符串) 或 ACCOUNTS_FILE(JSON 文件)：[{"email","password","targets":[...]}]"""
+    raw = ACCOUNTS
+    if ACCOUNTS_FILE:
+        with open(ACCOUNTS_FILE, encoding="utf-8") as f: raw = f.read()
+    accs = json.loads(raw) if raw.strip() else []
+    if not accs and MODE in ("daemon", "metrics"): accs = [{"email": EMAIL, "password": PASSWORD}]
+    for a in accs: a["targets"] = a.get("targets") or [TARGET_NAME]
+    return accs
+
+async def fleet_account(acc, gsem, psem):
+    email, targets = acc["email"], acc["targets"]
+    lease = None
+    try:
+        if POOL and ENGINE != "http":
+            # 等池里的浏览器时不能占着 gsem：已持有租约的账号要拿到 gsem 才能跑完并归还，否则互相等死
+            # psem 保证同一时刻只有一个线程阻塞在池上，不会把默认线程池耗光
+            async with psem: lease = await asyncio.to_thread(POOL.acquire, PROXIES.current())
+        async with gsem:
+            gh, ip = await asyncio.to_thread(open_gh, email, acc["password"], lease)
+            servers = await asyncio.to_thread(INVENTORY.lookup, gh, targets)
+    except Exception as e:
+        print(f"🚨 账号 {email[:3]}*** 登录失败: {e}")
+        if 'gh' in locals(): await asyncio.to_thread(gh.close)
+        if lease: await asyncio.to_thread(lease.release)
+        return [{"account": email, "name": n, "sid": None, "kind": "error", "before": 0, "after": 0, "cooldown_s": 0, "message": str(e)[:100]} for n in targets]
+    # 同一个 Chrome 不能并发操作，浏览器引擎按账号串行
+    asem = asyncio.Semaphore(ACCOUNT_CONCURRENCY if isinstance(gh, HttpGH) else 1)
+    async def one(name):
+        async with asem, gsem:
+            return await asyncio.to_thread(renew_target, gh, name, ip, servers.get(name), email)
+    try:
+        return await asyncio.gather(*(one(n) for n in targets))
+    finally:
+        await asyncio.to_thread(gh.close)
+
+async def fleet_main(accs):
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(FLEET_CONCURRENCY + 4))
+    gsem, psem = asyncio.Semaphore(FLEET_CONCURRENCY), asyncio.Semaphore(1)
+    return [r for rs in await asyncio.gather(*(fleet_account(a, gsem, psem) for a in accs)) for r in rs]
+
+def run_fleet(accs):
+    t0 = time.time()
+    TRACE.start_profile()
+    enable_pool()
+    results, todo = [], []
+    for a in accs:
+        keep = []
+        for n in a["targets"]:
+            why = HISTORY.preflight(a["email"], n)
+            if why: results.append(skipped(a["email"], n, why))
+            else: keep.append(n)
+        if keep: todo.append({**a, "targets": keep})
+    try: results += asyncio.run(fleet_main(todo)) if todo else []
+    finally:
+        if POOL: POOL.shutdown()
+        PROFILES.prune()
+    print(f"📊 舰队汇总: {len(results)} 台服务器")
+    for r in results:
+        print(f"  {(r['account'] or '')[:3]}*** | {r['name']} | {r['kind']} | {r['before']} ➔ {r['after']}h | {r['message']}")
+    if FLEET_RESULT:
+        with open(FLEET_RESULT, "w", encoding="utf-8") as f: json.dump(public(results), f, ensure_ascii=False, indent=2)
+    OUTBOX.flush()
+    METRICS.observe("greathost_run_seconds", time.time() - t0, mode="fleet"); METRICS.write_textfile()
+    print(usage_line(t0))
+    TRACE.write(mode="fleet", strategies=STRATS.summary(), results=public(results))
+    return results
+
+# Daemon：优先队列按“下次能续上的时间”唤醒
+def next_wake(r, now=None):
+    now = now or time.time()
+    if r["kind"] == "cooldown":
+        t = now + r["cooldown_s"] + 30
+    elif r["kind"] == "renew_success":
+        # 冷却和小时数上限都过了才可能再续上；读不到冷却时才退回 DAEMON_MIN_S
+        wait = max(0, r["after"] - MAX_HOURS) * 3600
+        t = now + max(wait, r["cooldown_s"] + 30 if r.get("cooldown_s") is not None else DAEMON_MIN_S)
+    elif r["kind"] in ("error", "renew_failed"):
+        t = now + DAEMON_RETRY_S
+    else:
+        t = now + max(0, (r["after"] or r["before"]) - MAX_HOURS) * 3600
+    return min(max(t, now + DAEMON_MIN_S), now + DAEMON_MAX_S)
+
+def run_daemon(accs):
+    enable_pool()
+    METRICS.serve()
+    seq = itertools.count()
+    owner = {a["email"]: i for i, a in enumerate(accs)}
+    heap = [(0, next(seq), i, n) for i, a in enumerate(accs) for n in a["targets"]]
+    heapq.heapify(heap)
+    print(f"🛰️ 常驻模式启动: {len(accs)} 个账号 / {len(heap)} 台服务器")
+    while heap:
+        due = {}
+        while heap and heap[0][0] <= time.time():
+            _, _, i, name = heapq.heappop(heap)
+            due.setdefault(i, []).append(name)
+        if due:
+            TRACE.reset(); t0 = time.time()
+            results = asyncio.run(fleet_main([{**accs[i], "targets": names} for i, names in due.items()]))
+            METRICS.observe("greathost_run_seconds", time.time() - t0, mode="daemon"); METRICS.write_textfile()
+            if not NOTIFY_WINDOW_S: OUTBOX.flush()
+            PROFILES.prune()  # 池里还在用的槽位会跳过
+            TRACE.write(mode="daemon", strategies=STRATS.summary(), results=public(results))
+            for r in results:
+                wake = next_wake(r)
+                heapq.heappush(heap, (wake, next(seq), owner[r["account"]], r["name"]))
+                print(f"🗓️ {r['name']} | {r['kind']} | {r['after'] or r['before']}h | 下次检查 {datetime.fromtimestamp(wake, ZoneInfo('Asia/Shanghai')):%m/%d %H:%M}")
+        time.sleep(max(1, heap[0][0] - time.time()))
+
+# Metrics 模式：后台只读轮询剩余时间/状态/冷却，抓取直接读缓存
+def server_state(gh, srv, acct):
+    """只读：走续期引擎同样的路径选择读状态/剩余/冷却，不续期不通知"""
+    st, via = STRATS.run(gh, "read", srv)
+    return {"account": acct, "name": srv.get("name"), "sid": srv["id"], "before": st["hours"], "after": st["hours"],
+            "status": st["status"], "cooldown_s": st["cooldown_s"], "strategy": via}
+
+def poll_account(acc):
+    gh = None
+    try:
+        gh, _ = open_gh(acc["email"], acc["password"])
+        servers = INVENTORY.lookup(gh, acc["targets"])
+        for name in acc["targets"]:
+            srv = servers.get(name)
+            if not srv:
+                METRICS.inc("greathost_poll_errors_total", account=METRICS.account(acc["email"]), reason="not_found"); continue
+            METRICS.server({**server_state(gh, srv, acc["email"]), "name": name})
+    except Exception as e:
+        print(f"⚠️ 指标轮询失败 {acc['email'][:3]}***: {e}")
+        METRICS.inc("greathost_poll_errors_total", account=METRICS.account(acc["email"]), reason="error")
+    finally:
+        if gh: gh.close()
+
+def run_metrics(accs):
+    METRICS.serve()
+    if not METRICS.srv and not METRICS_FILE: raise SystemExit("MODE=metrics 需要 METRICS_PORT 或 METRICS_FILE")
+    print(f"📈 指标轮询启动: {len(accs)} 个账号，每 {METRICS_POLL_S}s 刷新一次")
+    while True:
+        t0 = time.time()
+        with ThreadPoolExecutor(min(FLEET_CONCURRENCY, len(accs)) or 1) as ex: list(ex.map(poll_account, accs))
+        METRICS.write_textfile()
+        time.sleep(max(1, METRICS_POLL_S - (time.time() - t0)))
+
+# CLI：子命令只加载自己用到的依赖，python greathost.py 不带参数仍按 MODE 运行
+def cli_status(accs):
+    for acc in accs:
+        gh, _ = open_gh(acc["email"], acc["password"])
+        try:
+            servers = INVENTORY.lookup(gh, acc["targets"])
+            for name in acc["targets"]:
+                srv = servers.get(name)
+                if not srv:
+                    print(f"❓ {acc['email'][:3]}*** | {name} | 未找到"); continue
+                st = server_state(gh, srv, acc["email"])
+                icon, label = STATUS_MAP.get(st["status"], ["❓", st["status"]])
+                cd = st["cooldown_s"]
+                print(f"{icon} {acc['email'][:3]}*** | {name} ({st['sid']}) | 剩余 {st['after']}h | {label} | "
+                      f"冷却 {f'{-(-cd // 60)} 分钟' if cd else '可续期'} | 路径 {st['strategy']}")
+        finally:
+            gh.close()
+
+def cli_list_servers(accs):
+    for acc in accs:
+        gh, _ = open_gh(acc["email"], acc["password"])
+        try:
+            for s in INVENTORY.lookup(gh, force=True).values(): print(f"🖥️ {acc['email'][:3]}*** | {s.get('name')} | {s.get('id')} | {s.get('type', '')}")
+        finally:
+            gh.close()
+
+def cli_check_proxy():
+    if not PROXIES.urls: return print("ℹ️ 未配置 PROXY_URL / PROXY_URLS，直连")
+    PROXIES.refresh(force=True)
+    for i, u in enumerate(PROXIES.ranked()):
+        rec = PROXIES.health[PROXIES._key(u)]
+        print(f"{'⭐' if i == 0 else '  '} {mask_host(proxy_host(u))} | {rec.get('latency')}s | 出口 {rec.get('ip')}")
+    if not PROXIES.ranked(): raise SystemExit("🚫 没有可用代理")
+
+def main(argv=None):
+    import argparse
+    p = argparse.ArgumentParser(prog="greathost.py", description="GreatHost 免费服务器续期")
+    sub = p.add_subparsers(dest="cmd")
+    for name, doc in (("renew", "续期(默认)，配置 ACCOUNTS 时走舰队模式"), ("status", "只读查看剩余时间/状态/冷却，不续期不通知"),
+                      ("list-servers", "列出账号下的服务器"), ("check-proxy", "探测代理池，按延迟排序"),
+                      ("daemon", "常驻，按截止时间调度"), ("metrics", "后台轮询并导出 Prometheus 指标"), ("history", "打印近 7 天运行历史")):
+        sp = sub.add_parser(name, help=doc)
+        if name in ("renew", "status", "daemon", "metrics"):
+            sp.add_argument("-t", "--target", action="append", help="服务器名，可重复；默认 TARGET_NAME")
+    a = p.parse_args(argv)
+    cmd = a.cmd or (MODE if MODE in ("daemon", "metrics", "history") else "renew")
+    accs = load_accounts()
+    if cmd in ("status", "list-servers", "daemon", "metrics") or getattr(a, "target", None):
+        accs = accs or [{"email": EMAIL, "password": PASSWORD, "targets": [TARGET_NAME]}]
+    if getattr(a, "target", None): accs = [{**x, "targets": a.target} for x in accs]
+    if cmd == "history": print_history()
+    elif cmd == "check-proxy": cli_check_proxy()
+    elif cmd == "status": cli_status(accs)
+    elif cmd == "list-servers": cli_list_servers(accs)
+    elif cmd == "metrics": run_metrics(accs)
+    elif cmd == "daemon":
+        OUTBOX.window_s = NOTIFY_WINDOW_S
+        run_daemon(accs)
+    elif accs: run_fleet(accs)
+    else: run()
 
 if __name__ == "__main__":
-    run()
+    main()
@@ -1,20 +1,23 @@
-import os, re, time, random, requests
+import os, re, time, random
 from datetime import datetime
-from urllib.parse import urlparse
 from zoneinfo import ZoneInfo
 
-from seleniumwire import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from greathost import (BASE_URL, IP_CHECK_URL, OUTBOX, PROFILES, PROXIES, SESSIONS, TRACE, ResourceBlocker, make_driver, nap,
+                       driver_cookies, driver_restore, page_timing, quit_driver, wait_mutation, wait_settled)
+
 # Config
 EMAIL = os.getenv("GREATHOST_EMAIL", "")
 PASSWORD = os.getenv("GREATHOST_PASSWORD", "")
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "")
-PROXY_URL = os.getenv("PROXY_URL", "")
+START_JITTER_S = int(os.getenv("START_JITTER_S", "60")) # 启动前随机等待上限(仅 human)
+EXEC_PROFILE = os.getenv("EXEC_PROFILE", "fast").lower() # fast 事件驱动等待 / human 保留拟人随机停顿
+HUMAN = EXEC_PROFILE == "human"
 
 STATUS_MAP = {
     "Running": ["🟢", "运行中"],
@@ -27,37 +30,12 @@ STATUS_MAP = {
 def now_shanghai():
     return datetime.now(ZoneInfo("Asia/Shanghai")).strftime('%Y/%m/%d %H:%M:%S')
 
-def mask_host(h):
-    if not h: return "Unknown"
-    if ":" in h:
-        p = h.split(':')
-        return f"{p[0]}:{p[1]}:****:{p[-1]}" if len(p) > 3 else f"{h[:9]}****"
-    parts = h.split('.')
-    if len(parts) == 4: return f"{parts[0]}.{parts[1]}.***.{parts[3]}"
-    if len(parts) >= 3: return f"{parts[0]}.****.{parts[-1]}"
-    return f"{h[:4]}****"
-
-def get_proxy_expected_host():
-    raw = (os.getenv("PROXY_URL") or "").strip()
-    if not raw: return None
-    try:
-        tmp = raw if "://" in raw else f"http://{raw}"
-        host = urlparse(tmp).hostname
-        return host.lower().replace("[","").replace("]","") if host else None
-    except:
-        return None
-
-EXPECTED_HOST = get_proxy_expected_host()
+BLOCKER = ResourceBlocker()
 
 # Telegram
 def send_telegram(msg):
-    if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID: return
-    s = requests.Session(); s.trust_env = False
-    try:
-        url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-        s.post(url, data={"chat_id": TELEGRAM_CHAT_ID, "text": msg, "parse_mode": "HTML"}, timeout=5)
-    except Exception as e:
-        print("TG send failed:", e)
+    # 入队，运行结束时由 OUTBOX 合并发送
+    OUTBOX.push(msg)
 
 def format_fields(fields):
     return "\n".join(f"{emoji} <b>{label}:</b> {value}" for emoji,label,value in fields)
@@ -77,26 +55,16 @@ def send_notice(kind, fields):
     send_telegram(msg)
     print("Notify:", title, "|", body.replace("\n"," | "))
 
-# Proxy check (3 steps)
-def check_proxy_ip(driver):
-    if not PROXY_URL.strip():
+# Proxy check：代理池并发探测 + 出口 IP 校验，选最快的健康代理
+def check_proxy_ip():
+    if not PROXIES.urls:
         print("No proxy configured, skip proxy check.")
-        return True
-    proxy = {"http": PROXY_URL, "https": PROXY_URL}
+        return ""
     now = now_shanghai()
     try:
-        r = requests.get("https://api64.ipify.org?format=json", proxies=proxy, timeout=12)
-        current_ip = r.json().get("ip","").lower()
-        print("Proxy IP:", current_ip)
-        if EXPECTED_HOST:
-            match_full = (EXPECTED_HOST in current_ip) or (current_ip in PROXY_URL.lower())
-            ipv6_match = (":" in current_ip and ":" in EXPECTED_HOST and current_ip.split(':')[:4] == EXPECTED_HOST.split(':')[:4])
-            if not (match_full or ipv6_match):
-                m_exp, m_cur = mask_host(EXPECTED_HOST), mask_host(current_ip)
-                raise Exception(f"BLOCK_ERR|{m_exp}|{m_cur}")
-        driver.set_page_load_timeout(30)
-        driver.get("https://api.ipify.org?format=json")
-        return True
+        proxy = PROXIES.current()
+        print("Proxy IP:", PROXIES.health[PROXIES._key(proxy)].get("ip"))
+        return proxy
     except Exception as e:
         clean = str(e).replace('<','[').replace('>',']')
         if "BLOCK_ERR" in clean:
@@ -112,26 +80,34 @@ def check_proxy_ip(driver):
             send_telegram(msg); raise Exception(clean)
 
 # Browser helpers
-def get_browser():
+def pause(a, b=None):
+    # 拟人停顿，只在 human 模式生效
+    if HUMAN: nap(random.uniform(a, b) if b is not None else a)
+
+def settle(driver):
+    # 点击后的等待：human 固定 2s，fast 等 DOM/网络安静下来
+    if HUMAN: nap(2)
+    else: wait_settled(driver)
+
+def get_browser(proxy=""):
     # 1. 基础浏览器参数配置
     opts = Options()
     opts.add_argument("--headless=new"); opts.add_argument("--no-sandbox")
     opts.add_argument("--disable-dev-shm-usage"); opts.add_argument("--window-size=1920,1080")
     opts.add_argument("--lang=en-US")
     opts.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-    # 2. 只有当代理为空时，直连
-    if PROXY_URL and str(PROXY_URL).strip().lower() != "none":
-        sw = {'proxy': {'http': PROXY_URL, 'https': PROXY_URL, 'no_proxy': 'localhost,127.0.0.1'}}
+    # 2. 只有当代理为空时，直连；代理默认原生交给 Chrome，资源拦截在 make_driver 里挂上
+    if proxy:
         print(f"Log: Browser starting with proxy.")
-        return webdriver.Chrome(options=opts, seleniumwire_options=sw)
+        return make_driver(opts, BLOCKER, proxy)
     else:        
-        print("Log: PROXY_URL is empty, launching in direct mode.")
-        return webdriver.Chrome(options=opts)
+        print("Log: No proxy, launching in direct mode.")
+        return make_driver(opts, BLOCKER, "")
 
 def safe_send_keys(el, text):
     try: el.clear()
     except: pass
-    el.send_keys(text); time.sleep(0.12)
+    el.send_keys(text); pause(0.12)
 
 def safe_click(driver, el):
     try: el.click()
@@ -142,8 +118,8 @@ def safe_click(driver, el):
 def click_button(driver, el, desc, js_selector=None):
     try:
         driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", el)
-        time.sleep(random.uniform(1.0,2.0))
-        safe_click(driver, el); time.sleep(2); print("Clicked:", desc); return True
+        pause(1.0, 2.0)
+        safe_click(driver, el); settle(driver); print("Clicked:", desc); return True
     except Exception as e:
         print("Click failed:", e, "try JS")
         try:
@@ -151,7 +127,7 @@ def click_button(driver, el, desc, js_selector=None):
                 driver.execute_script(f"document.querySelector('{js_selector}').click();")
             else:
                 driver.execute_script("arguments[0].click();", el)
-            time.sleep(2); return True
+            settle(driver); return True
         except Exception as e2:
             print("JS click failed:", e2); return False
 
@@ -164,31 +140,49 @@ def perform_step(driver, wait, desc, locator, js_selector=None):
 
 # Core actions
 def login(driver, wait):
-    driver.get("https://greathost.es/login")
+    driver.get(f"{BASE_URL}/login"); page_timing(driver, "/login")
     e = wait.until(EC.presence_of_element_located((By.NAME,"email")))
     try: click_button(driver, e, "email focus")
     except: pass
-    time.sleep(0.2); safe_send_keys(e, EMAIL)
+    pause(0.2); safe_send_keys(e, EMAIL)
     p = wait.until(EC.presence_of_element_located((By.NAME,"password")))
     try: click_button(driver, p, "password focus")
     except: pass
-    time.sleep(0.2); safe_send_keys(p, PASSWORD)
-    time.sleep(random.uniform(0.6,1.2))
+    pause(0.2); safe_send_keys(p, PASSWORD)
+    pause(0.6, 1.2)
     s = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR,"button[type='submit']")))
     safe_click(driver, s); wait.until(EC.url_contains("/dashboard")); print("Logged in")
 
+def resume_session(driver, wait):
+    cookies = SESSIONS.load(EMAIL, PASSWORD)
+    if not cookies: return False
+    driver.get(f"{BASE_URL}/login")
+    ok = driver_restore(driver, cookies)
+    if ok:
+        driver.get(f"{BASE_URL}/dashboard"); wait.until(EC.url_contains("/dashboard"))
+        print("Session restored, skip login"); return True
+    if ok is None: print("Session check inconclusive, keep cache and login again")
+    else: SESSIONS.drop(EMAIL); print("Cached session expired, login again")
+    return False
+
 def simulate_human(driver, wait):
     if random.random() > 0.5:
-        driver.get("https://greathost.es/services"); time.sleep(random.randint(3,6))
-        driver.get("https://greathost.es/dashboard"); wait.until(EC.url_contains("/dashboard"))
-        time.sleep(random.uniform(0.8,2.0))
+        driver.get(f"{BASE_URL}/services"); nap(random.randint(3,6))
+        driver.get(f"{BASE_URL}/dashboard"); wait.until(EC.url_contains("/dashboard"))
+        nap(random.uniform(0.8,2.0))
 
 def go_to_details(driver, wait):
     perform_step(driver, wait, "Billing icon", (By.CLASS_NAME,'btn-billing-compact'), ".btn-billing-compact")
     perform_step(driver, wait, "View Details", (By.LINK_TEXT,'View Details'), "a[href*='details']")
+    page_timing(driver, "/contracts/{sid}")
     return driver.current_url.split('/')[-1] or "unknown"
 
 def get_hours(driver, selector="#accumulated-time"):
+    if not HUMAN:
+        # 显式等到元素里出现数字，再走下面的读取逻辑
+        js = "return (document.querySelector(arguments[0])||{textContent:''}).textContent;"
+        try: WebDriverWait(driver, 10, poll_frequency=0.1).until(lambda d: re.search(r'\d', d.execute_script(js, selector) or ''))
+        except: pass
     for _ in range(3):
         try:
             el = WebDriverWait(driver, 6).until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
@@ -198,7 +192,7 @@ def get_hours(driver, selector="#accumulated-time"):
             except: text = ""
         num = int(re.sub(r'\D', '', text)) if re.search(r'\d', text or '') else 0
         if num: return num, text.strip()
-        time.sleep(random.uniform(2.5, 4.5))
+        pause(2.5, 4.5)
     return 0, (text or "").strip()
 
 def get_error_msg(driver):
@@ -208,21 +202,28 @@ def get_error_msg(driver):
 
 def renew_click(driver, wait):
     perform_step(driver, wait, "Renew button", (By.ID,'renew-free-server-btn'))
+    if not HUMAN:
+        # 等到上限文案出现或累计时间变化，最多 3s
+        wait_mutation(driver, "#accumulated-time", "5 días", 3)
+        msg = get_error_msg(driver)
+        if msg: print(f"DEBUG: 抓到报错 -> {msg}")
+        return msg
     end = time.time() + 3
     while time.time() < end:
         msg = get_error_msg(driver)
         if msg: 
             print(f"DEBUG: 抓到报错 -> {msg}")
             return msg
-        time.sleep(random.uniform(0.3, 0.6))
+        pause(0.3, 0.6)
     return ""
 
 def confirm_and_start(driver, wait):
     final = "运行正常"; started = False
     try:
-        driver.get("https://greathost.es/dashboard")
+        driver.get(f"{BASE_URL}/dashboard")
         wait.until(EC.presence_of_element_located((By.CLASS_NAME,'server-status-indicator')))
-        time.sleep(1.5)
+        if HUMAN: nap(1.5)
+        else: wait.until(lambda d: d.find_element(By.CLASS_NAME,'server-status-indicator').get_attribute('title'))
         ind = driver.find_element(By.CLASS_NAME,'server-status-indicator')
         final = ind.get_attribute('title') or "Unknown"
     except Exception as e:
@@ -235,20 +236,28 @@ def confirm_and_start(driver, wait):
 
 # Main
 def run_task():
-    time.sleep(random.randint(1,60))
-    driver = None; server_id = "未知"; before = 0; after = 0; status_display = "🟢 运行正常"
+    TRACE.start_profile()
+    if HUMAN:
+        with TRACE.span("start_jitter"): nap(random.randint(min(1, START_JITTER_S), START_JITTER_S))
+    driver = None; server_id = "未知"; before = 0; after = 0; status_display = "🟢 运行正常"; outcome = "error"
     try:
-        driver = get_browser() 
+        with TRACE.span("proxy_check"): proxy = check_proxy_ip()
+        with TRACE.span("chrome_start"): driver = get_browser(proxy) 
         
-        if globals().get('PROXY_URL'):
-            check_proxy_ip(driver)
+        if proxy:
+            driver.set_page_load_timeout(30)
+            driver.get(IP_CHECK_URL)
         
         wait = WebDriverWait(driver, 15)
-        login(driver, wait)
-        simulate_human(driver, wait)
+        with TRACE.span("session_restore"): restored = resume_session(driver, wait)
+        if not restored:
+            with TRACE.span("login"): login(driver, wait)
+            SESSIONS.save(EMAIL, PASSWORD, driver_cookies(driver))
+        if HUMAN:
+            with TRACE.span("simulate_human"): simulate_human(driver, wait)
 
-        server_id = go_to_details(driver, wait)
-        before, _ = get_hours(driver)
+        with TRACE.span("go_to_details"): server_id = go_to_details(driver, wait)
+        with TRACE.span("get_hours"): before, _ = get_hours(driver)
         print("Before hours:", before)
 
         renew_btn = wait.until(EC.presence_of_element_located((By.ID,"renew-free-server-btn")))
@@ -256,14 +265,14 @@ def run_task():
         if 'Wait' in btn_html:
             m = re.search(r'\d+', btn_html); wt = m.group(0) if m else "??"
             fields = [("🆔","服务器ID",f"<code>{server_id}</code>"),("⏰","冷却时间",f"{wt} 分钟"),("📊","当前累计",f"{before}h"),("🚀","服务器状态",status_display)]
-            send_notice("cooldown", fields)
+            send_notice("cooldown", fields); outcome = "cooldown"
             return # finally 会处理 driver.quit()
 
-        err_msg = renew_click(driver, wait)
-        after, _ = get_hours(driver)      
+        with TRACE.span("renew_click"): err_msg = renew_click(driver, wait)
+        with TRACE.span("get_hours"): after, _ = get_hours(driver)      
         print(f"Final after hours used for 判定: {after}")
         
-        final_status, started_flag = confirm_and_start(driver, wait)
+        with TRACE.span("confirm_and_start"): final_status, started_flag = confirm_and_start(driver, wait)
         if started_flag:
             icon, name = STATUS_MAP.get(final_status, ["❓", final_status])
             status_display = f"✅ 已触发启动 ({icon} {name})"
@@ -285,13 +294,13 @@ def run_task():
          # 拆分判断逻辑以便打印  # 拆分判断逻辑以便打印     
         if is_success:
             fields = [("🆔","ID",f"<code>{server_id}</code>"),("⏰","增加时间",f"{before} ➔ {after}h"),("🚀","服务器状态",status_display)]
-            send_notice("renew_success", fields)
+            send_notice("renew_success", fields); outcome = "renew_success"
         elif is_maxed:
             fields = [("🆔","ID",f"<code>{server_id}</code>"),("⏰","剩余时间",f"{after}h"),("🚀","服务器状态",status_display),("💡","提示","已近120h上限，暂无需续期。")]
-            send_notice("maxed_out", fields)
+            send_notice("maxed_out", fields); outcome = "maxed_out"
         else:
             fields = [("🆔","ID",f"<code>{server_id}</code>"),("⏰","剩余时间",f"{before}h"),("🚀","服务器状态",status_display),("💡","提示","时间未增加，请手动确认。")]
-            send_notice("renew_failed", fields)
+            send_notice("renew_failed", fields); outcome = "renew_failed"
 
     except Exception as e:
         err = str(e).replace('<','[').replace('>',']')
@@ -305,8 +314,15 @@ def run_task():
         else: print("Proxy/Network/Env error, skip business notify.")
     finally:
         if driver:
-            try: driver.quit(); print("Browser closed")
+            try: BLOCKER.report(driver)
+            except: pass
+            try:
+                with TRACE.span("chrome_quit"): quit_driver(driver)
+                print("Browser closed")
             except: pass
+        PROFILES.prune()
+        OUTBOX.flush()
+        TRACE.write(mode="dom", results=[{"sid": server_id, "kind": outcome, "before": before, "after": after}])
 
 if __name__ == "__main__":
     run_task()
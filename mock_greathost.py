@@ -0,0 +1,213 @@
+"""GreatHost 本地替身站：复刻登录/面板/合同页和 JSON 接口，含冷却与 120h 上限语义，可注入延迟与错误。
+
+python mock_greathost.py --port 8800 --servers loveMC,alpha --hours 60 --latency-ms 40 --error-rate 0.05
+然后 GREATHOST_BASE_URL=http://127.0.0.1:8800 IP_CHECK_URL=http://127.0.0.1:8800/ip python greathost.py
+"""
+import argparse, hashlib, json, random, re, secrets, threading, time
+from datetime import datetime, timedelta, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CAP_H = 120        # 免费续期最多累计 5 天
+RENEW_H = 12       # 每次免费续期增加的小时数
+
+def iso(dt):
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+class Site:
+    def __init__(self, names=("loveMC",), hours=60, cooldown_s=1800, email="", password="",
+                 latency_ms=0, jitter_ms=0, error_rate=0.0, cooldown_field=True, status="running"):
+        self.cfg = dict(names=names, hours=hours, status=status)
+        self.cooldown_s, self.email, self.password = cooldown_s, email, password
+        self.latency_ms, self.jitter_ms, self.error_rate, self.cooldown_field = latency_ms, jitter_ms, error_rate, cooldown_field
+        self.lock, self.sessions = threading.Lock(), set()
+        self.reset()
+
+    def reset(self):
+        now = datetime.now(timezone.utc)
+        with self.lock:
+            self.servers = {f"srv-{i + 1:04d}": {"id": f"srv-{i + 1:04d}", "name": n, "status": self.cfg["status"],
+                            "expiry": now + timedelta(hours=self.cfg["hours"]), "last_renew": None}
+                            for i, n in enumerate(self.cfg["names"])}
+            self.hits, self.listed_at = {}, int(time.time())
+
+    def hours(self, s):
+        return max(0, int((s["expiry"] - datetime.now(timezone.utc)).total_seconds() // 3600))
+
+    def cooldown_left(self, s):
+        if not s["last_renew"]: return 0
+        return max(0, int(self.cooldown_s - (datetime.now(timezone.utc) - s["last_renew"]).total_seconds()))
+
+    def renewal_info(self, s):
+        info = {"nextRenewalDate": iso(s["expiry"]), "hours": self.hours(s)}
+        if self.cooldown_field:
+            info["freeRenewalAvailableAt"] = iso(datetime.now(timezone.utc) + timedelta(seconds=self.cooldown_left(s)))
+        return info
+
+    def renew(self, sid):
+        with self.lock:
+            s = self.servers[sid]
+            left = self.cooldown_left(s)
+            if left: return {"success": False, "message": f"Wait {-(-left // 60)} minutes"}
+            if self.hours(s) + RENEW_H > CAP_H: return {"success": False, "message": "No puedes renovar más de 5 días"}
+            s["expiry"] += timedelta(hours=RENEW_H); s["last_renew"] = datetime.now(timezone.utc)
+            return {"success": True, "message": f"+{RENEW_H}h", "details": {"nextRenewalDate": iso(s["expiry"]), "hours": self.hours(s)}}
+
+    def btn_label(self, s):
+        left = self.cooldown_left(s)
+        return f"Wait {-(-left // 60)} minutes" if left else "Renew Free Server"
+
+PAGE = "<!doctype html><html><head><meta charset='utf-8'><title>GreatHost</title><link rel='stylesheet' href='/static/app.css'></head><body>{}</body></html>"
+
+def login_page():
+    return PAGE.format("""<form method="post" action="/login">
+<input type="hidden" name="_csrf" value="mock-csrf">
+<input name="email" type="email"><input name="password" type="password">
+<button type="submit">Login</button></form><img src="/static/logo.png">""")
+
+def dashboard_page(site):
+    start = "<button class='btn-start' onclick=\"fetch('/api/servers/{}/start',{{method:'POST'}})\">Start</button>"
+    cards = "".join(f"""<div class="server-card"><span class="server-status-indicator" title="{s['status'].capitalize()}"></span>
+<b>{s['name']}</b><a class="btn-billing-compact" href="/billing">💳</a>{start.format(s['id']) if s['status'] in ('stopped', 'offline') else ''}</div>"""
+                    for s in site.servers.values())
+    return PAGE.format(cards)
+
+def billing_page(site):
+    return PAGE.format("".join(f"<a href='/services/details/{sid}'>View Details</a>" for sid in site.servers))
+
+def contract_page(site, s):
+    return PAGE.format(f"""<h1>{s['name']}</h1><span id="accumulated-time">{site.hours(s)} hours</span>
+<button id="renew-free-server-btn">{site.btn_label(s)}</button>
+<script>
+document.getElementById('renew-free-server-btn').addEventListener('click', async () => {{
+  const r = await fetch('/api/renewal/contracts/{s['id']}/renew-free', {{method: 'POST'}}).then(r => r.json());
+  if (r.success) document.getElementById('accumulated-time').textContent = r.details.hours + ' hours';
+  else {{ const d = document.createElement('div'); d.className = 'alert'; d.textContent = r.message; document.body.appendChild(d); }}
+}});
+</script>""")
+
+class Handler(BaseHTTPRequestHandler):
+    site: Site = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *a): pass
+
+    def _send(self, code, body=b"", ctype="text/html; charset=utf-8", headers=()):
+        body = body.encode() if isinstance(body, str) else body
+        self.send_response(code)
+        self.send_header("Content-Type", ctype); self.send_header("Content-Length", str(len(body)))
+        for k, v in headers: self.send_header(k, v)
+        self.end_headers(); self.wfile.write(body)
+
+    def _json(self, code, obj):
+        self._send(code, json.dumps(obj, ensure_ascii=False), "application/json")
+
+    def _servers(self):
+        """服务器列表支持 ETag / Last-Modified 条件请求，未变化回 304"""
+        site = self.site
+        body = json.dumps({"servers": [{"id": s["id"], "name": s["name"], "type": "minecraft"} for s in site.servers.values()]})
+        etag, modified = f'"{hashlib.sha1(body.encode()).hexdigest()[:16]}"', formatdate(site.listed_at, usegmt=True)
+        inm, ims = self.headers.get("If-None-Match"), self.headers.get("If-Modified-Since")
+        try: unchanged = inm == etag if inm else bool(ims) and parsedate_to_datetime(ims).timestamp() >= site.listed_at
+        except (TypeError, ValueError): unchanged = False
+        headers = [("ETag", etag), ("Last-Modified", modified)]
+        if unchanged: return self._send(304, b"", "application/json", headers)
+        return self._send(200, body, "application/json", headers)
+
+    def _redirect(self, loc, headers=()):
+        self._send(302, "", headers=[("Location", loc), *headers])
+
+    def _authed(self):
+        m = re.search(r"gh_session=([\w-]+)", self.headers.get("Cookie", ""))
+        return bool(m and m.group(1) in self.site.sessions)
+
+    def _delay(self):
+        site = self.site
+        if site.latency_ms or site.jitter_ms:
+            time.sleep(max(0, site.latency_ms + random.uniform(-site.jitter_ms, site.jitter_ms)) / 1000)
+
+    def _route(self, method):
+        site, path = self.site, urlparse(self.path).path
+        site.hits[f"{method} {path}"] = site.hits.get(f"{method} {path}", 0) + 1
+        self._delay()
+        if path == "/__reset" and method == "POST":
+            site.reset(); return self._json(200, {"ok": True})  # 只重置服务器状态，保留会话，方便测缓存会话
+        if path == "/__stats":
+            return self._json(200, site.hits)
+        if path == "/ip":
+            return self._json(200, {"ip": self.client_address[0]})
+        if path.startswith("/static/"):
+            return self._send(200, b"\0" * 2048, "application/octet-stream", [("Cache-Control", "public, max-age=86400")])
+        if path == "/login" and method == "GET":
+            return self._send(200, login_page())
+        if path == "/login" and method == "POST":
+            n = int(self.headers.get("Content-Length", 0) or 0)
+            form = {k: v[0] for k, v in parse_qs(self.rfile.read(n).decode()).items()}
+            ok = form.get("email") and form.get("password") and (not site.email or form["email"] == site.email) \
+                and (not site.password or form["password"] == site.password)
+            if not ok: return self._redirect("/login?error=1")
+            token = secrets.token_hex(16); site.sessions.add(token)
+            return self._redirect("/dashboard", [("Set-Cookie", f"gh_session={token}; Path=/; HttpOnly")])
+
+        if path.startswith("/api/"):
+            if not self._authed(): return self._json(401, {"success": False, "message": "Unauthorized"})
+            if site.error_rate and random.random() < site.error_rate:
+                return self._json(503, {"success": False, "message": "Service Unavailable"})
+            if path == "/api/servers":
+                return self._servers()
+            m = re.fullmatch(r"/api/servers/([\w-]+)/(information|start)", path)
+            if m and m.group(1) in site.servers:
+                s = site.servers[m.group(1)]
+                if m.group(2) == "start" and method == "POST": s["status"] = "running"
+                return self._json(200, {"id": s["id"], "name": s["name"], "status": s["status"]})
+            m = re.fullmatch(r"/api/renewal/contracts/([\w-]+)(/renew-free)?", path)
+            if m and m.group(1) in site.servers:
+                if m.group(2) and method == "POST": return self._json(200, site.renew(m.group(1)))
+                return self._json(200, {"contract": {"id": m.group(1), "renewalInfo": site.renewal_info(site.servers[m.group(1)])}})
+            return self._json(404, {"success": False, "message": "Not found"})
+
+        if not self._authed(): return self._redirect("/login")
+        if path == "/dashboard": return self._send(200, dashboard_page(site))
+        if path == "/services": return self._send(200, PAGE.format("<h1>Services</h1>"))
+        if path == "/billing": return self._send(200, billing_page(site))
+        m = re.fullmatch(r"/(?:contracts|services/details)/([\w-]+)", path)
+        if m and m.group(1) in site.servers: return self._send(200, contract_page(site, site.servers[m.group(1)]))
+        return self._send(404, "Not found")
+
+    def do_GET(self): self._route("GET")
+    def do_POST(self): self._route("POST")
+
+def serve(site, host="127.0.0.1", port=0):
+    """后台线程启动替身站，返回 (server, base_url)"""
+    handler = type("BoundHandler", (Handler,), {"site": site})
+    srv = ThreadingHTTPServer((host, port), handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f"http://{host}:{srv.server_address[1]}"
+
+def site_args(p):
+    p.add_argument("--servers", default="loveMC", help="逗号分隔的服务器名")
+    p.add_argument("--hours", type=int, default=60, help="初始剩余小时")
+    p.add_argument("--cooldown", type=int, default=1800, help="两次免费续期之间的冷却秒数")
+    p.add_argument("--latency-ms", type=float, default=0)
+    p.add_argument("--jitter-ms", type=float, default=0)
+    p.add_argument("--error-rate", type=float, default=0.0, help="API 随机返回 503 的概率")
+    p.add_argument("--no-cooldown-field", action="store_true", help="合同数据不带冷却字段，逼客户端读按钮")
+    p.add_argument("--status", default="running")
+    return p
+
+def site_from(a):
+    return Site(tuple(a.servers.split(",")), a.hours, a.cooldown, latency_ms=a.latency_ms, jitter_ms=a.jitter_ms,
+                error_rate=a.error_rate, cooldown_field=not a.no_cooldown_field, status=a.status)
+
+if __name__ == "__main__":
+    p = site_args(argparse.ArgumentParser(description="GreatHost 本地替身站"))
+    p.add_argument("--port", type=int, default=8800)
+    a = p.parse_args()
+    srv, url = serve(site_from(a), port=a.port)
+    print(f"🧪 替身站已启动: {url}")
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        srv.shutdown()